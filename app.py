@@ -75,28 +75,38 @@ with tab2:
         
         # Filters
         c1, c2, c3 = st.columns([2, 1, 1])
-        search_text = c1.text_input("关键词搜索 (标题/摘要)")
+        search_text = c1.text_input("关键词搜索 (标题/摘要/正文)")
         
         # Get Source Names
         sources_df = pd.read_sql("SELECT DISTINCT source_name FROM policies", conn)
         source_options = ["所有部门"] + sources_df['source_name'].tolist()
         selected_source = c2.selectbox("发布部门", source_options)
+        date_range = c3.date_input("发布日期范围", value=())
         
-        # Query Construction
-        query = "SELECT id, title, source_name, publish_date, url, summary FROM policies WHERE 1=1"
-        params = []
-        
+        # publish_date 为 ISO 日期，区间查询走索引
+        dates = (date_range[0].isoformat(), date_range[1].isoformat()) if len(date_range) == 2 else None
+        source_filter = selected_source if selected_source != "所有部门" else None
+
         if search_text:
-            query += " AND (title LIKE ? OR summary LIKE ?)"
-            params.extend([f"%{search_text}%", f"%{search_text}%"])
-            
-        if selected_source != "所有部门":
-            query += " AND source_name = ?"
-            params.append(selected_source)
-            
-        query += " ORDER BY publish_date DESC LIMIT 100"
-        
-        df = pd.read_sql_query(query, conn, params=params)
+            # 全文索引检索 (标题/摘要/正文)，按相关度排序；多个关键词以空格分隔，须同时出现
+            storage = Storage(db_path)
+            rows = storage.search(search_text, limit=100, source_name=source_filter, date_range=dates)
+            storage.close()
+            df = pd.DataFrame(rows, columns=['id', 'title', 'source_name', 'publish_date', 'url', 'summary'])
+        else:
+            query = "SELECT id, title, source_name, publish_date, url, summary FROM policies WHERE 1=1"
+            params = []
+
+            if source_filter:
+                query += " AND source_name = ?"
+                params.append(source_filter)
+
+            if dates:
+                query += " AND publish_date BETWEEN ? AND ?"
+                params.extend(dates)
+
+            query += " ORDER BY publish_date DESC LIMIT 100"
+            df = pd.read_sql_query(query, conn, params=params)
         conn.close()
         
         st.write(f"找到 {len(df)} 条记录")
@@ -187,7 +197,10 @@ with tab4:
         with st.chat_message("assistant"):
             with st.spinner("AI 正在思考..."):
                 rag = RAGEngine(config)
-                response = rag.chat(prompt)
+                try:
+                    response = rag.chat(prompt)
+                finally:
+                    rag.close()
                 st.markdown(response)
         
         st.session_state.messages.append({"role": "assistant", "content": response})
@@ -22,10 +22,14 @@ def export_db_to_json():
     c = conn.cursor()
     
     # Export all policies sorted by date
-    c.execute("SELECT id, title, source_name, publish_date, url, summary FROM policies ORDER BY publish_date DESC")
+    c.execute("SELECT id, title, source_name, publish_date, url, summary, keywords, key_metrics, deadlines FROM policies ORDER BY publish_date DESC")
     rows = c.fetchall()
     
     policies = [dict(row) for row in rows]
+    # key_metrics / deadlines stored as JSON arrays
+    for p in policies:
+        for field in ('key_metrics', 'deadlines'):
+            p[field] = json.loads(p[field]) if p[field] else []
     
     # Save to JSON
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -42,5 +46,66 @@ def export_db_to_json():
     with open(os.path.join(output_dir, "stats.json"), 'w', encoding='utf-8') as f:
         json.dump(stats, f, ensure_ascii=False, indent=2)
 
+    export_run_metrics(output_dir)
+
+def export_run_metrics(output_dir, report_path="reports/run_report.json"):
+    """Publish a summary of the latest run report (slowest sources, LLM usage) as docs/metrics.json"""
+    if not os.path.exists(report_path):
+        return
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+
+    def seconds(stats, prefix):
+        return round(sum(v for k, v in stats.items() if k.startswith(prefix) and k.endswith('_seconds')), 3)
+
+    sources = [
+        {
+            "source": name,
+            "fetch_seconds": seconds(stats, 'fetch_'),
+            "parse_seconds": seconds(stats, 'parse_'),
+            "items_seen": stats.get('items_seen', 0),
+            "items_skipped": stats.get('items_skipped', 0),
+            "items_kept": stats.get('items_kept', 0),
+            "items_failed": stats.get('items_failed', 0),
+        }
+        for name, stats in report.get('sources', {}).items()
+    ]
+    sources.sort(key=lambda s: s['fetch_seconds'] + s['parse_seconds'], reverse=True)
+    llm = {
+        model: {
+            "calls": sum(v for k, v in stats.items() if k.startswith('llm_') and k.endswith('_count')),
+            "seconds": seconds(stats, 'llm_'),
+            "prompt_tokens": stats.get('llm_tokens_prompt', 0),
+            "completion_tokens": stats.get('llm_tokens_completion', 0),
+            "cache_hits": sum(v for k, v in stats.items() if k.startswith('llm_cache_hit')),
+            "cache_misses": sum(v for k, v in stats.items() if k.startswith('llm_cache_miss')),
+        }
+        for model, stats in report.get('llm', {}).items()
+    }
+    stages = report.get('stages', {})
+    accept_tp, accept_fp, reject_tn, reject_fn = (
+        stages.get(f'classifier_eval_{k}', 0) for k in ('accept_tp', 'accept_fp', 'reject_tn', 'reject_fn')
+    )
+    # Precision of automatic decisions, estimated from audited samples
+    classifier = {
+        "auto_accept": stages.get('classifier_auto_accept', 0),
+        "auto_reject": stages.get('classifier_auto_reject', 0),
+        "sent_to_llm": stages.get('classifier_llm', 0) + stages.get('classifier_audit', 0),
+        "accept_precision": round(accept_tp / (accept_tp + accept_fp), 3) if accept_tp + accept_fp else None,
+        "reject_precision": round(reject_tn / (reject_tn + reject_fn), 3) if reject_tn + reject_fn else None,
+    }
+    summary = {
+        "started_at": report.get('started_at'),
+        "duration_seconds": report.get('duration_seconds'),
+        "stages": report.get('stages', {}),
+        "sources": sources,
+        "llm": llm,
+        "classifier": classifier,
+        "llm_budget": report.get('llm_budget'),
+    }
+    with open(os.path.join(output_dir, "metrics.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"Exported run metrics to {os.path.join(output_dir, 'metrics.json')}")
+
 if __name__ == "__main__":
     export_db_to_json()
@@ -1,4 +1,3 @@
-import sqlite3
 import json
 import os
 from policy_agent.storage import Storage
@@ -27,35 +26,13 @@ def import_json_to_db():
 
     print(f"Importing {len(policies)} policies from {json_path}...")
     
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    count = 0
+    # One executemany transaction; URLs already in the DB are skipped by Storage
     for p in policies:
-        # Check existence by URL
-        c.execute("SELECT id FROM policies WHERE url = ?", (p['url'],))
-        if c.fetchone():
-            continue
-            
-        # Insert (Assuming schema matches Storage.save_policy logic mostly)
-        # Note: policies.json keys: id, title, source_name, publish_date, url, summary
-        # storage table: id, title, source_name, publish_date, url, summary, crawled_at
-        
-        c.execute('''
-            INSERT INTO policies (title, source_name, publish_date, url, summary)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            p.get('title'),
-            p.get('source_name'),
-            p.get('publish_date'),
-            p.get('url'),
-            p.get('summary', '')
-        ))
-        count += 1
-        
-    conn.commit()
-    conn.close()
-    print(f"Imported {count} new policies (duplicates skipped).")
+        p.setdefault('title', None)
+        p.setdefault('source_name', None)
+    saved, _ = storage.save_policies([p for p in policies if p.get('url')])
+    storage.close()
+    print(f"Imported {len(saved)} new policies (duplicates skipped).")
 
 if __name__ == "__main__":
     import_json_to_db()
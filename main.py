@@ -2,14 +2,26 @@ import argparse
 import schedule
 import time
 import sys
-from policy_agent.utils import load_config, load_sources, logger
+from policy_agent.utils import load_config, load_sources, logger, text_hash
 from policy_agent.storage import Storage
 from policy_agent.crawler import PolicyCrawler
 from policy_agent.summarizer import Summarizer
 from policy_agent.notifier import Notifier
+from policy_agent.pipeline import PolicyPipeline
+from policy_agent.cache import PageCache
+from policy_agent.extractor import format_content
+from policy_agent.classifier import PolicyClassifier, bootstrap as bootstrap_classifier
+from policy_agent.matcher import KeywordMatcher
+from policy_agent.metrics import metrics
+from policy_agent.vector_index import VectorIndex, make_embedder
 
-def job():
-    logger.info("开始执行每日抓取任务...")
+def _frontier_policy(row):
+    """由 frontier 记录还原 policy 对象 (续跑时使用)"""
+    keys = ('title', 'source_name', 'publish_date', 'publish_date_raw', 'url', 'keywords', 'summary', 'key_metrics', 'deadlines', 'content')
+    return {key: row[key] for key in keys}
+
+def job(resume=False):
+    logger.info("开始执行每日抓取任务..." if not resume else "续跑上次中断的抓取任务...")
     
     # 1. 加载配置
     config = load_config()
@@ -18,44 +30,165 @@ def job():
         logger.error("配置加载失败，任务终止")
         return
 
-    # 2. 初始化模块
+    metrics.reset()
+    storage = None
+    try:
+        # 2. 初始化模块
+        storage = Storage()
+        summarizer = Summarizer(config, storage)
+        crawler = PolicyCrawler(config, sources, storage, summarizer)
+        notifier = Notifier(config)
+
+        # 续跑时：已生成摘要/已入库但未推送的政策从 frontier 恢复，不再调用 LLM
+        summarized, saved = [], []
+        if resume:
+            for row in storage.frontier_pending():
+                if row['stage'] == 'summarized':
+                    summarized.append(_frontier_policy(row))
+                elif row['stage'] == 'saved':
+                    saved.append(_frontier_policy(row))
+        else:
+            storage.clear_frontier()
+
+        # 3. 流水线执行：抓取+筛选 -> 摘要 -> 入库 -> 推送 (每完成一步即记录到 frontier)
+        # 模拟测试时，可能希望忽略日期限制，这里可以在 config 增加 debug 选项
+        # crawler 内部逻辑目前比较严格，需确保 sources.json 选择器准确
+        # 向量索引：先补上尚未索引的政策 (如 import_data.py 导入的)，之后随入库增量追加
+        index = VectorIndex(config, make_embedder(config, getattr(summarizer, 'client', None)))
+        index.sync(storage)
+        pipeline = PolicyPipeline(config, crawler, summarizer, storage, notifier, index)
+        pipeline.run(resume=resume, summarized=summarized, saved=saved)
+
+        logger.info("任务执行完毕")
+    finally:
+        # 每次运行输出各来源/各阶段耗时、条目数与 LLM 用量
+        metrics.write(config)
+        if storage:
+            # 关闭连接时把 WAL 中的数据写回主库文件 (CI 只缓存 policy_data.db)
+            storage.close()
+
+def replay_from_cache(since=None):
+    """
+    基于本地缓存的详情页重新执行 LLM 筛选与摘要，不访问政府网站
+    用于调整提示词/筛选规则后刷新数据库：已入库的政策更新摘要，新通过筛选的政策入库
+    """
+    config = load_config()
+    if not config:
+        logger.error("配置加载失败，任务终止")
+        return
+
+    cache = PageCache(config)
+    pages = cache.entries(since=since)
+    if not pages:
+        logger.info("缓存中没有可重放的页面")
+        return
+    logger.info(f"从缓存重放 {len(pages)} 个详情页...")
+
     storage = Storage()
-    summarizer = Summarizer(config)
-    crawler = PolicyCrawler(config, sources, storage, summarizer)
-    notifier = Notifier(config)
-
-    # 3. 抓取 (返回 policy 对象列表)
-    # 模拟测试时，可能希望忽略日期限制，这里可以在 config 增加 debug 选项
-    # crawler 内部逻辑目前比较严格，需确保 sources.json 选择器准确
-    new_policies = crawler.run()
-    
-    logger.info(f"本次运行共抓取到 {len(new_policies)} 条新政策")
-
-    # 4. 生成摘要并保存
-    processed_policies = []
-    for p in new_policies:
-        # 生成摘要
-        summary = summarizer.generate_summary(p['content'])
-        p['summary'] = summary
-        
-        # 保存到数据库
-        if storage.save_policy(p):
-            processed_policies.append(p)
-    
-    # 5. 推送
-    notifier.send(processed_policies)
-    logger.info("推送流程已执行")
+    summarizer = Summarizer(config, storage)
+    keywords = config.get('keywords', [])
+    matcher = KeywordMatcher(keywords, config.get('exclude_keywords', []))
+
+    updated, added, rejected = 0, 0, 0
+    updated_urls = []
+    for meta in pages:
+        page = cache.get(meta['url'])
+        if page is None or not page['text']:
+            continue
+        title, content = page['title'], page['text']
+        # 与抓取时一致：发布信息只放在 LLM 筛选输入中
+        llm_content = format_content(content, page['publisher'], page['publish_date'])
+        # 合并模式下一次调用同时得到结论与摘要
+        analysis = summarizer.analyze_policy(title, llm_content) if summarizer.combined else None
+        is_relevant = analysis['is_relevant'] if analysis else summarizer.check_policy_relevance(title, llm_content)
+        if is_relevant is None:
+            continue
+        signature = summarizer.relevance_signature
+        if signature:
+            # 重放得到的结论同样写入结论表，下次抓取据此跳过
+            storage.save_verdicts([{
+                "url": page['url'],
+                "title_hash": text_hash(title),
+                "content_hash": text_hash(content),
+                "verdict": int(is_relevant),
+                "reason": "llm",
+                "model": signature[0],
+                "prompt_version": signature[1],
+            }])
+        if not is_relevant:
+            if storage.is_processed(page['url']):
+                # 不自动删除已入库数据，仅提示人工复核
+                logger.warning(f"已入库政策在重放中未通过筛选，请复核: {title}")
+            rejected += 1
+            continue
 
-    logger.info("任务执行完毕")
+        found, _ = matcher.find(f"{title}\n{content}")
+        policy_keywords = ",".join(kw for kw in keywords if kw in found)
+        details = {"key_metrics": analysis['key_metrics'], "deadlines": analysis['deadlines']} if analysis else {}
+        summary = analysis['summary'] if analysis and analysis['summary'] else summarizer.generate_summary(content)
+        if storage.update_policy(page['url'], summary, policy_keywords, content=content, **details):
+            updated += 1
+            updated_urls.append(page['url'])
+        elif storage.save_policy({
+            "title": title,
+            "source_name": page['source_name'],
+            "publish_date": page['publish_date'],
+            "publish_date_raw": page['publish_date_raw'],
+            "url": page['url'],
+            "summary": summary,
+            "keywords": policy_keywords,
+            "content": content,
+            **details,
+        }):
+            added += 1
+
+    # 摘要/正文已更新的政策重新生成向量，新入库的追加到索引
+    index = VectorIndex(config, make_embedder(config, getattr(summarizer, 'client', None)))
+    index.sync(storage)
+    if updated_urls:
+        try:
+            index.update(storage.policy_documents(urls=updated_urls))
+        except Exception as e:
+            logger.error(f"更新向量索引失败: {e}")
+    storage.close()
+    logger.info(f"缓存重放完成：更新 {updated} 条，新增 {added} 条，未通过筛选 {rejected} 条")
+
+def train_classifier():
+    """用结论表中的 LLM 结论 (正文取自详情页缓存) 与已入库政策重新训练本地分类器"""
+    config = load_config()
+    if not config:
+        logger.error("配置加载失败，任务终止")
+        return
+    classifier = PolicyClassifier(config)
+    if not classifier.enabled:
+        logger.warning("config.yaml 中 classifier.enabled 未开启")
+        return
+    storage = Storage()
+    count = bootstrap_classifier(classifier, storage, PageCache(config))
+    storage.close()
+    classifier.save()
+    logger.info(
+        f"本地分类器训练完成：{count} 条样本 (相关 {classifier.class_docs[1]} / 不相关 {classifier.class_docs[0]})"
+    )
 
 def main():
     parser = argparse.ArgumentParser(description="数字经济政策自动采集 Agent")
     parser.add_argument('--now', action='store_true', help='立即执行一次')
     parser.add_argument('--loop', action='store_true', help='开启定时循环模式')
+    parser.add_argument('--resume', action='store_true', help='与 --now 合用：从上次中断的阶段继续，不重复抓取页面和调用 LLM')
+    parser.add_argument('--from-cache', action='store_true', help='基于本地缓存的详情页重新筛选并生成摘要，不抓取网站')
+    parser.add_argument('--since', help='与 --from-cache 合用：只重放该日期 (YYYY-MM-DD) 之后发布的政策')
+    parser.add_argument('--train-classifier', action='store_true', help='用历史筛选结论重新训练本地预分类器')
     args = parser.parse_args()
 
+    if args.train_classifier:
+        train_classifier()
+
+    if args.from_cache:
+        replay_from_cache(since=args.since)
+
     if args.now:
-        job()
+        job(resume=args.resume)
     
     if args.loop:
         config = load_config()
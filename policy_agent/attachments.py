@@ -0,0 +1,181 @@
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import iterparse
+from .extractor import parse_html
+from .utils import logger
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF 解析为可选依赖
+    PdfReader = None
+
+ATTACHMENT_EXTENSIONS = ('.pdf', '.docx', '.doc', '.wps', '.ofd')
+CHUNK_SIZE = 64 * 1024
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+OFD_PAGE_RE = re.compile(r'Pages/Page_(\d+)/Content\.xml$')
+
+
+def find_attachments(html, page_url):
+    """从详情页中找出附件链接，返回 [(url, 名称)]"""
+    if not html:
+        return []
+    try:
+        doc = parse_html(html)
+    except Exception:
+        return []
+    found = {}
+    for a in doc.iter('a'):
+        href = (a.get('href') or '').strip()
+        if not href or href.startswith(('javascript:', '#', 'mailto:')):
+            continue
+        url = urljoin(page_url, href)
+        path = urlparse(url).path.lower()
+        if path.endswith(ATTACHMENT_EXTENSIONS) and url not in found:
+            name = a.text_content().strip() or os.path.basename(urlparse(url).path)
+            found[url] = name
+    return list(found.items())
+
+
+def _pdf_text(path, max_chars):
+    if PdfReader is None:
+        logger.warning("未安装 pypdf，跳过 PDF 附件")
+        return ""
+    reader = PdfReader(path)
+    parts, total = [], 0
+    # 逐页提取，达到字数上限即停止，不解析剩余页面
+    for page in reader.pages:
+        text = (page.extract_text() or "").strip()
+        if text:
+            parts.append(text)
+            total += len(text)
+        if total >= max_chars:
+            break
+    return "\n".join(parts)
+
+
+def _docx_text(zf, max_chars):
+    parts, total = [], 0
+    with zf.open('word/document.xml') as f:
+        # 流式解析段落，处理完即清理节点，避免整份文档驻留内存
+        for _, el in iterparse(f, events=('end',)):
+            if el.tag != WORD_NS + 'p':
+                continue
+            text = "".join(t.text or "" for t in el.iter(WORD_NS + 't')).strip()
+            el.clear()
+            if text:
+                parts.append(text)
+                total += len(text)
+            if total >= max_chars:
+                break
+    return "\n".join(parts)
+
+
+def _ofd_text(zf, max_chars):
+    pages = []
+    for name in zf.namelist():
+        match = OFD_PAGE_RE.search(name)
+        if match:
+            pages.append((int(match.group(1)), name))
+    parts, total = [], 0
+    for _, name in sorted(pages):
+        with zf.open(name) as f:
+            for _, el in iterparse(f, events=('end',)):
+                # OFD 文字位于 TextObject/TextCode，命名空间因生成工具而异
+                if el.tag.endswith('TextCode'):
+                    text = (el.text or "").strip()
+                    if text:
+                        parts.append(text)
+                        total += len(text)
+                    el.clear()
+        if total >= max_chars:
+            break
+    return "".join(parts)
+
+
+class AttachmentExtractor:
+    """详情页附件 (PDF/DOCX/OFD) 的流式下载与增量文本提取，在独立线程池中运行"""
+
+    def __init__(self, config, session, limiter=None):
+        self.config = config.get('attachments', {})
+        self.enabled = self.config.get('enabled', True)
+        self.max_bytes = self.config.get('max_mb', 20) * 1024 * 1024
+        self.max_chars = self.config.get('max_chars', 5000)
+        self.max_files = self.config.get('max_files', 3)
+        self.timeout = config.get('crawler', {}).get('timeout', 30000) / 1000
+        self.session = session
+        self.limiter = limiter
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.config.get('workers', 2), thread_name_prefix="attachment"
+        )
+
+    def _download(self, url, f):
+        """流式下载到临时文件，超过大小上限返回 False"""
+        if self.limiter:
+            self.limiter.acquire(url)
+        with self.session.get(url, timeout=self.timeout, stream=True) as resp:
+            if self.limiter:
+                self.limiter.report(url, resp.status_code, resp.headers.get('Retry-After'))
+            resp.raise_for_status()
+            length = resp.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                logger.info(f"附件超过大小上限 ({int(length) // 1024} KB)，跳过: {url}")
+                return False
+            size = 0
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    logger.info(f"附件超过大小上限，停止下载: {url}")
+                    return False
+                f.write(chunk)
+        return True
+
+    def _parse(self, path, max_chars):
+        """按文件头判断格式 (扩展名常与实际格式不符，如 .wps 可能是 docx)"""
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+        if magic.startswith(b'%PDF'):
+            return _pdf_text(path, max_chars)
+        if magic.startswith(b'PK'):
+            with zipfile.ZipFile(path) as zf:
+                names = set(zf.namelist())
+                if 'word/document.xml' in names:
+                    return _docx_text(zf, max_chars)
+                if any(OFD_PAGE_RE.search(name) for name in names):
+                    return _ofd_text(zf, max_chars)
+        logger.info("暂不支持的附件格式 (如旧版 doc/wps)，跳过")
+        return ""
+
+    def extract(self, url, max_chars=None):
+        """下载并提取单个附件文本，失败返回空字符串"""
+        max_chars = max_chars or self.max_chars
+        fd, path = tempfile.mkstemp(prefix="policy_attachment_")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if not self._download(url, f):
+                    return ""
+            return self._parse(path, max_chars)
+        except Exception as e:
+            logger.warning(f"附件提取失败 {url}: {e}")
+            return ""
+        finally:
+            os.remove(path)
+
+    def extract_all(self, attachments):
+        """依次提取附件，累计字数达到上限即停止；返回带附件名标题的文本"""
+        parts, total = [], 0
+        for url, name in attachments[:self.max_files]:
+            text = self.extract(url, self.max_chars - total)
+            if text:
+                parts.append(f"【附件：{name}】\n{text}")
+                total += len(text)
+            if total >= self.max_chars:
+                break
+        return "\n\n".join(parts)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
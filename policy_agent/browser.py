@@ -0,0 +1,105 @@
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from .utils import logger
+
+# 只需要 page.content() / innerText，这些资源类型一律拦截
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet", "texttrack", "manifest"}
+
+# 统计/监测类第三方域名 (含子域名)
+TRACKER_DOMAINS = [
+    "hm.baidu.com",
+    "cnzz.com",
+    "51.la",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "growingio.com",
+    "sensorsdata.cn",
+    "zhuge.io",
+    "kaipuyun.cn",        # 政府网站普查/监测脚本
+    "zfwzgl.www.gov.cn",  # 政府网站找错纠错脚本
+]
+
+
+def _match_domain(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def should_block(request, allow=None):
+    """
+    判断请求是否应被拦截
+    allow: 来源配置中的 allow_resources，如 {"resource_types": ["stylesheet"], "domains": ["cdn.example.com"]}
+    """
+    allow = allow or {}
+    host = urlparse(request.url).hostname or ""
+    if _match_domain(host, allow.get('domains', [])):
+        return False
+    if _match_domain(host, TRACKER_DOMAINS):
+        return True
+    return (request.resource_type in BLOCKED_RESOURCE_TYPES
+            and request.resource_type not in allow.get('resource_types', []))
+
+
+async def _handle_route(route, allow):
+    try:
+        if should_block(route.request, allow):
+            await route.abort()
+        else:
+            await route.continue_()
+    except Exception as e:
+        # 页面已关闭或请求已被处理
+        logger.debug(f"请求拦截处理失败 {route.request.url}: {e}")
+
+
+async def block_resources(target, allow=None):
+    """为 page 或 context 安装资源拦截"""
+    await target.route("**/*", lambda route: _handle_route(route, allow))
+
+
+class PagePool:
+    """复用少量浏览器页面，避免每个 URL 都 new_page()；每次借出时可指定来源的拦截白名单"""
+
+    def __init__(self, context, size, block=True):
+        self.context = context
+        self.size = max(1, size)
+        self.block = block
+        self._idle = asyncio.Queue()
+        self._created = 0
+        self._allow = {}
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        if self.block:
+            await page.route("**/*", lambda route: _handle_route(route, self._allow.get(page)))
+        return page
+
+    @asynccontextmanager
+    async def page(self, allow=None):
+        # 队列中的 None 表示空闲名额 (页面尚未创建或已崩溃关闭)
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            page = None
+        else:
+            page = await self._idle.get()
+        
+        if page is None:
+            try:
+                page = await self._new_page()
+            except Exception:
+                self._idle.put_nowait(None)
+                raise
+        
+        self._allow[page] = allow
+        try:
+            yield page
+        finally:
+            self._allow.pop(page, None)
+            self._idle.put_nowait(None if page.is_closed() else page)
+
+    async def close(self):
+        while not self._idle.empty():
+            page = self._idle.get_nowait()
+            if page is not None and not page.is_closed():
+                await page.close()
+        self._created = 0
@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from .utils import logger
+
+
+class PageCache:
+    """
+    详情页本地缓存：HTML 与提取后的正文压缩后按内容哈希存储 (相同内容只存一份)，
+    索引记录 URL -> 内容哈希及政策元数据，超出容量时按最近访问时间淘汰
+    """
+
+    def __init__(self, config):
+        self.config = config.get('cache', {})
+        self.enabled = self.config.get('enabled', True)
+        self.dir = self.config.get('dir', '.cache/pages')
+        self.max_bytes = self.config.get('max_mb', 500) * 1024 * 1024
+        self.index_path = os.path.join(self.dir, 'index.db')
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(os.path.join(self.dir, 'objects'), exist_ok=True)
+            self._init_index()
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path)
+
+    def _init_index(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT,
+                size INTEGER,
+                title TEXT,
+                source_name TEXT,
+                publish_date TEXT,
+                publish_date_raw TEXT,
+                created_at REAL,
+                accessed_at REAL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_hash ON pages (content_hash)")
+        conn.commit()
+        conn.close()
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.dir, 'objects', content_hash[:2], content_hash[2:] + '.json.gz')
+
+    def put(self, url, html, text, meta=None, publisher=""):
+        """缓存一个详情页；meta 为 title/source_name/publish_date/publish_date_raw，发布机构随正文存入对象"""
+        if not self.enabled:
+            return
+        meta = meta or {}
+        payload = json.dumps(
+            {"html": html or "", "text": text or "", "publisher": publisher or ""}, ensure_ascii=False
+        ).encode('utf-8')
+        content_hash = hashlib.sha256(payload).hexdigest()
+        path = self._object_path(content_hash)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+            now = time.time()
+            conn = self._connect()
+            previous = conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO pages
+                (url, content_hash, size, title, source_name, publish_date, publish_date_raw, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                url, content_hash, size, meta.get('title'), meta.get('source_name'),
+                meta.get('publish_date'), meta.get('publish_date_raw'), now, now
+            ))
+            conn.commit()
+            if previous and previous[0] != content_hash:
+                # 页面内容变化：旧对象不再被引用时删除，否则不计入容量也不会被淘汰
+                self._remove_if_unused(conn, previous[0])
+            conn.close()
+            self._evict()
+
+    def get(self, url):
+        """读取缓存，返回 {"html", "text", "publisher", 元数据...}，未命中返回 None"""
+        if not self.enabled:
+            return None
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            conn.close()
+            return None
+        conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        conn.commit()
+        conn.close()
+        try:
+            with gzip.open(self._object_path(row['content_hash']), 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"缓存文件损坏 {url}: {e}")
+            return None
+        data.setdefault('publisher', "")
+        data.update({key: row[key] for key in ('url', 'title', 'source_name', 'publish_date', 'publish_date_raw')})
+        return data
+
+    def entries(self, since=None):
+        """列出缓存中的页面元数据 (可按发布日期过滤)，按发布日期倒序"""
+        if not self.enabled:
+            return []
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        sql = "SELECT url, title, source_name, publish_date, publish_date_raw FROM pages"
+        params = []
+        if since:
+            sql += " WHERE publish_date >= ?"
+            params.append(since)
+        sql += " ORDER BY publish_date DESC"
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+        conn.close()
+        return rows
+
+    def _remove_if_unused(self, conn, content_hash):
+        """对象文件不再被任何 URL 引用时删除，返回释放的字节数"""
+        if conn.execute("SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+            return 0
+        path = self._object_path(content_hash)
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+
+    def _evict(self):
+        """总大小超过上限时按最近访问时间 (LRU) 淘汰，删除不再被引用的对象文件"""
+        conn = self._connect()
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM pages)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            conn.close()
+            return
+        evicted = 0
+        for url, content_hash in conn.execute(
+            "SELECT url, content_hash FROM pages ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            evicted += 1
+            total -= self._remove_if_unused(conn, content_hash)
+        conn.commit()
+        conn.close()
+        logger.info(f"缓存超出容量，已淘汰 {evicted} 个页面")
@@ -0,0 +1,202 @@
+import os
+import random
+import re
+import zlib
+import numpy as np
+from .utils import logger
+
+# 特征维度 (哈希桶数)，2^18 个桶足以容纳标题+正文前摘的字符 n-gram
+N_FEATURES = 1 << 18
+NGRAM_RANGE = (1, 3)
+ALPHA = 0.1 # 拉普拉斯平滑
+
+
+class PolicyClassifier:
+    """
+    本地相关性预分类器：字符 n-gram 哈希特征 + TF-IDF 加权的多项式朴素贝叶斯 (NumPy 实现，仅需 CPU)
+    - 以 LLM 的筛选结论为标注，每得到一条结论即增量更新计数，运行结束时保存
+    - 高置信度的候选直接通过/排除，只有中间地带才调用 LLM；按 audit_rate 抽检高置信度候选，
+      分别统计自动通过与自动排除的 precision
+    """
+
+    def __init__(self, config):
+        self.config = config.get('classifier', {})
+        self.enabled = self.config.get('enabled', False)
+        self.path = self.config.get('path', '.cache/classifier.npz')
+        self.accept_threshold = self.config.get('accept_threshold', 0.95)
+        self.reject_threshold = self.config.get('reject_threshold', 0.05)
+        self.min_samples = self.config.get('min_samples', 30)
+        self.audit_rate = self.config.get('audit_rate', 0.1)
+        self.snippet_chars = self.config.get('snippet_chars', 500)
+        # 每类的特征计数 / 文档数，各特征的文档频率
+        self.feature_counts = np.zeros((2, N_FEATURES), dtype=np.float32)
+        self.class_docs = np.zeros(2, dtype=np.int64)
+        self.doc_freq = np.zeros(N_FEATURES, dtype=np.int32)
+        # 重新训练 (--train-classifier) 次数，计入分类器版本，使旧的排除结论失效
+        self.generation = 0
+        self._log_prob = None
+        self._dirty = False
+        # 本次运行统计：决策分布，以及抽检样本上自动通过 (accept_tp/fp) 与自动排除 (reject_tn/fn) 的对错
+        self.stats = {
+            "auto_accept": 0, "auto_reject": 0, "llm": 0, "audit": 0,
+            "accept_tp": 0, "accept_fp": 0, "reject_tn": 0, "reject_fn": 0,
+        }
+        if self.enabled and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        try:
+            data = np.load(self.path)
+            self.feature_counts = data['feature_counts']
+            self.class_docs = data['class_docs']
+            self.doc_freq = data['doc_freq']
+            self.generation = int(data['generation']) if 'generation' in data else 0
+            logger.info(f"已载入本地分类器 (相关 {self.class_docs[1]} 条 / 不相关 {self.class_docs[0]} 条)")
+        except Exception as e:
+            logger.warning(f"载入本地分类器失败，将重新训练: {e}")
+
+    def save(self):
+        if not self.enabled or not self._dirty:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path, feature_counts=self.feature_counts, class_docs=self.class_docs, doc_freq=self.doc_freq,
+            generation=self.generation
+        )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _features(self, title, content):
+        """标题 + 正文前摘的字符 n-gram，哈希到固定维度；返回 (特征下标, 次线性词频)"""
+        text = re.sub(r'\s+', '', f"{title or ''}{(content or '')[:self.snippet_chars]}")
+        grams = [
+            text[i:i + n]
+            for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+            for i in range(len(text) - n + 1)
+        ]
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        hashed = np.fromiter(
+            (zlib.crc32(gram.encode('utf-8')) % N_FEATURES for gram in grams), dtype=np.int64, count=len(grams)
+        )
+        indices, counts = np.unique(hashed, return_counts=True)
+        return indices, (1.0 + np.log(counts)).astype(np.float32)
+
+    def signature(self, filter_signature):
+        """
+        分类器结论的 (model, prompt_version)，记入筛选结论表：
+        包含 LLM 筛选的模型与提示词版本 (标注来源)、重新训练次数与阈值，任一变化后旧结论不再沿用
+        """
+        model, prompt_version = filter_signature
+        return (
+            f"classifier:{model}",
+            f"{prompt_version}|g{self.generation}|{self.reject_threshold}/{self.accept_threshold}",
+        )
+
+    @property
+    def ready(self):
+        """两类样本都足够时才参与决策"""
+        return self.enabled and int(self.class_docs.min()) >= self.min_samples
+
+    def learn(self, title, content, label):
+        """增量训练一条样本 (label 为 LLM 结论)"""
+        if not self.enabled:
+            return
+        indices, tf = self._features(title, content)
+        label = int(bool(label))
+        self.feature_counts[label, indices] += tf
+        self.class_docs[label] += 1
+        self.doc_freq[indices] += 1
+        self._log_prob = None
+        self._dirty = True
+
+    def predict(self, title, content):
+        """返回相关概率；样本不足时返回 None"""
+        if not self.ready:
+            return None
+        if self._log_prob is None:
+            smoothed = self.feature_counts + ALPHA
+            self._log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        indices, tf = self._features(title, content)
+        if not len(indices):
+            return None
+        n_docs = int(self.class_docs.sum())
+        idf = np.log((1 + n_docs) / (1 + self.doc_freq[indices])) + 1.0
+        weights = tf * idf
+        weights /= np.linalg.norm(weights)
+        prior = np.log(self.class_docs / self.class_docs.sum())
+        scores = prior + self._log_prob[:, indices] @ weights
+        log_odds = float(scores[1] - scores[0])
+        return float(1.0 / (1.0 + np.exp(-np.clip(log_odds, -50, 50))))
+
+    def decide(self, title, content):
+        """
+        返回 (决策, 概率)：决策为 True (自动通过) / False (自动排除) / None (交给 LLM)
+        高置信度的候选按 audit_rate 抽检，同样交给 LLM 以评估分类器
+        """
+        probability = self.predict(title, content)
+        if probability is None:
+            return None, None
+        confident = probability >= self.accept_threshold or probability <= self.reject_threshold
+        if confident and random.random() < self.audit_rate:
+            self.stats['audit'] += 1
+            return None, probability
+        if probability >= self.accept_threshold:
+            self.stats['auto_accept'] += 1
+            return True, probability
+        if probability <= self.reject_threshold:
+            self.stats['auto_reject'] += 1
+            return False, probability
+        self.stats['llm'] += 1
+        return None, probability
+
+    def evaluate(self, probability, label):
+        """
+        以 LLM 结论检验抽检样本：按实际阈值判断分类器本会自动通过还是排除，记录其对错
+        中间地带的样本本就交给 LLM，不计入
+        """
+        if probability is None:
+            return
+        if probability >= self.accept_threshold:
+            self.stats['accept_tp' if label else 'accept_fp'] += 1
+        elif probability <= self.reject_threshold:
+            self.stats['reject_fn' if label else 'reject_tn'] += 1
+
+    def summary(self):
+        stats = dict(self.stats)
+        accepted = stats['accept_tp'] + stats['accept_fp']
+        rejected = stats['reject_tn'] + stats['reject_fn']
+        stats['accept_precision'] = round(stats['accept_tp'] / accepted, 3) if accepted else None
+        stats['reject_precision'] = round(stats['reject_tn'] / rejected, 3) if rejected else None
+        stats['accept_threshold'] = self.accept_threshold
+        stats['reject_threshold'] = self.reject_threshold
+        return stats
+
+
+def bootstrap(classifier, storage, cache):
+    """
+    从历史数据重新训练：结论表中的 LLM 结论 (正文取自详情页缓存) + 已入库政策 (标题与正文前摘)
+    正样本与线上预测使用同样的特征 (标题 + 正文前 snippet_chars 字)；早期未保存正文的政策退回用摘要
+    返回训练样本数
+    """
+    classifier.feature_counts[:] = 0
+    classifier.class_docs[:] = 0
+    classifier.doc_freq[:] = 0
+    classifier.generation += 1
+    seen, count = set(), 0
+    for row in storage.llm_verdicts():
+        page = cache.get(row['url'])
+        if page is None or not page['text']:
+            continue
+        classifier.learn(page['title'], page['text'], row['verdict'])
+        seen.add(row['url'])
+        count += 1
+    for policy in storage.policy_texts(classifier.snippet_chars):
+        if policy['url'] in seen:
+            continue
+        classifier.learn(policy['title'], policy['content'] or policy['summary'], True)
+        count += 1
+    classifier._dirty = True
+    return count
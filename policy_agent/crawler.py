@@ -1,10 +1,22 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-import re
-import time
-from urllib.parse import urljoin
-from .utils import logger
+import asyncio
+import hashlib
+import json
+import os
+from urllib.parse import urljoin, urlparse
+import requests
+from .attachments import AttachmentExtractor, find_attachments
+from .browser import PagePool
+from .cache import PageCache
+from .classifier import PolicyClassifier
+from .extractor import extract_main_content, format_content
+from .fetcher import HttpFetcher
+from .matcher import KeywordMatcher
+from .metrics import metrics
+from .throttle import RateLimiter, RETRYABLE_STATUS
+from .utils import logger, parse_date, normalize_date, text_hash
 
 class PolicyCrawler:
     def __init__(self, config, sources, storage, summarizer=None):
@@ -14,201 +26,717 @@ class PolicyCrawler:
         self.summarizer = summarizer
         self.keywords = config.get('keywords', [])
         self.exclude_keywords = config.get('exclude_keywords', [])
+        # 关键词/排除词自动机，构建一次，标题与正文共用
+        self.matcher = KeywordMatcher(self.keywords, self.exclude_keywords)
+        self.crawler_config = config.get('crawler', {})
+        self.timeout = self.crawler_config.get('timeout', 30000)
+        # 全局并发上限：同时打开的页面数 (列表页 + 详情页)
+        self.concurrency = max(1, int(self.crawler_config.get('concurrency', 4)))
+        # 静态页面 (is_dynamic: false) 及详情页优先走 HTTP，失败时再回退浏览器
+        self.http_fast_path = self.crawler_config.get('http_fast_path', True)
+        self.fetcher = HttpFetcher(config)
+        # 按域名限速 (crawler.rate_limit)，不同站点可以并行
+        self.limiter = RateLimiter(self.crawler_config.get('rate_limit', {}))
+        self.retries = max(1, int(self.crawler_config.get('retries', 3)))
+        # 详情页附件 (PDF/DOCX/OFD) 正文提取，在独立线程池中执行
+        self.attachments = AttachmentExtractor(config, self.fetcher.session, self.limiter)
+        self.cache = PageCache(config)
+        # 本地预分类器：高置信度候选不再调用 LLM
+        self.classifier = PolicyClassifier(config)
+        # 浏览器页面拦截图片/字体/样式/统计脚本等资源 (来源可用 allow_resources 放行)
+        self.block_resources = self.crawler_config.get('block_resources', True)
+        # 列表页未变化 (304 或列表指纹相同) 时跳过该来源
+        self.skip_unchanged = self.crawler_config.get('skip_unchanged', True)
+        # 翻页补抓：最多翻 max_pages 页，遇到已知条目或早于 horizon_days 天的条目即停止
+        self.max_pages = max(1, int(self.crawler_config.get('max_pages', 5)))
+        self.horizon_days = self.crawler_config.get('horizon_days', 30)
+        # 抓取开始时把已处理 URL 全部载入内存，列表项去重不再逐条查库
+        self.preload_urls = self.crawler_config.get('preload_urls', True)
+        self._known_urls = None
+        self._pending_states = {}
+        self._sink = None
+        self._verdicts = {}
+        # 批量筛选：多条候选合并为一次 filter_model 请求
+        summary_config = config.get('summary', {})
+        self.batch_size = max(1, int(summary_config.get('batch_size', 1)))
+        self.batch_wait = summary_config.get('batch_wait', 2.0)
+        self._batch = []
+        self._batch_timer = None
+        self._batch_tasks = set()
         
     def _is_yesterday(self, date_str):
-        """
-        判断日期字符串是否是昨天
-        支持格式: YYYY-MM-DD, YYYY/MM/DD, YYYY年MM月DD日
-        """
-        if not date_str:
+        """判断日期字符串是否是昨天"""
+        yesterday = datetime.now().date() - timedelta(days=1)
+        return parse_date(date_str) == yesterday
+
+    def _match_keywords(self, text):
+        """检查文本是否包含关键词，且不包含排除词"""
+        if not text:
             return False
             
-        # 清理日期字符串，去除多余空白
-        date_str = date_str.strip()
-        
-        today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
+        included, excluded = self.matcher.find(text)
+        # 只要标题包含任何排除词，立刻判定为不匹配
+        if excluded:
+            logger.debug(f"排除: {text} (包含 {excluded})")
+            return False
+        return bool(included)
+
+    def _extract_content(self, html):
+        """提取详情页正文 (去除导航/页脚/相关链接等) 及发布机构、发布日期"""
+        try:
+            return extract_main_content(html)
+        except Exception as e:
+            logger.error(f"提取正文失败: {e}")
+            return {"text": "", "title": "", "publisher": "", "publish_date": ""}
+
+    async def _get_page_pool(self):
+        """按需启动浏览器：全部走 HTTP 快速通道时不启动 Chromium"""
+        async with self._browser_lock:
+            if self._context is None:
+                logger.info("启动浏览器 (Playwright)")
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(
+                    headless=self.crawler_config.get('headless', True)
+                )
+                self._context = await self._browser.new_context()
+                self._page_pool = PagePool(self._context, self.concurrency, block=self.block_resources)
+            return self._page_pool
+
+    async def _close_browser(self):
+        if self._page_pool is not None:
+            await self._page_pool.close()
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = self._browser = self._context = self._page_pool = None
+
+    def _parse_list(self, html, page_url, source):
+        """解析列表页 HTML，返回列表项 [{title, url, publish_date (ISO 或空), publish_date_raw}]"""
+        soup = BeautifulSoup(html, 'lxml')
+        selectors = source['selectors']
+        items = soup.select(selectors['item'])
         
-        # 尝试多种格式解析
-        formats = [
-            '%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d',
-            '%Y年%m月%d日'
-        ]
+        logger.info(f"找到 {len(items)} 个列表项")
         
-        parsed_date = None
-        for fmt in formats:
+        entries = []
+        for item in items:
             try:
-                # 尝试提取日期部分 (简单正则辅助)
-                # 比如 "[2023-10-27]" -> "2023-10-27"
-                match = re.search(r'\d{4}[-年/.]\d{1,2}[-月/.]\d{1,2}(日)?', date_str)
-                if match:
-                    clean_date_str = match.group()
-                    parsed_date = datetime.strptime(clean_date_str, fmt).date()
-                    break
-            except ValueError:
-                continue
+                # 提取链接
+                link_el = item.select_one(selectors['link'])
+                if not link_el: continue
+                href = link_el.get('href')
+                # 使用实际页面 URL 作为 Base URL
+                full_url = urljoin(page_url, href)
                 
-        if parsed_date:
-            return parsed_date == yesterday
-        return False
+                # 提取标题
+                title_el = item.select_one(selectors['title'])
+                title = title_el.get_text(strip=True) if title_el else ""
+                
+                # 提取日期
+                date_el = item.select_one(selectors['date'])
+                date_str = date_el.get_text(strip=True) if date_el else ""
+                # 统一为 ISO 日期，页面上没有有效日期时尝试从 URL 提取
+                publish_date = normalize_date(date_str, full_url) or ""
+                    
+                entries.append({
+                    "title": title,
+                    "url": full_url,
+                    "publish_date": publish_date,
+                    "publish_date_raw": date_str
+                })
+            except Exception as item_e:
+                logger.error(f"解析列表项失败: {item_e}")
+                continue
+        return entries
 
-    def _match_keywords(self, text):
-        """检查文本是否包含关键词，且不包含排除词"""
-        if not text:
+    def _processed_among(self, urls):
+        """返回 urls 中已处理过的 URL (内存集合或一次批量查询)"""
+        if self._known_urls is not None:
+            return {url for url in urls if url in self._known_urls}
+        return self.storage.filter_processed(urls)
+
+    def _filter_signature(self):
+        """当前 LLM 筛选所用的 (模型, 提示词版本)，未启用 LLM 时为 None"""
+        return getattr(self.summarizer, 'relevance_signature', None)
+
+    def _classifier_signature(self):
+        """当前分类器结论的版本 (见 PolicyClassifier.signature)，未启用 LLM 时为 None"""
+        signature = self._filter_signature()
+        return self.classifier.signature(signature) if signature else None
+
+    def _verdict(self, entry, verdict, reason, content=None):
+        signature = {
+            'llm': self._filter_signature(),
+            'classifier': self._classifier_signature(),
+        }.get(reason)
+        return {
+            "url": entry['url'],
+            "title_hash": text_hash(entry['title']),
+            "content_hash": text_hash(content) if content is not None else None,
+            "verdict": int(bool(verdict)),
+            "reason": reason,
+            "model": signature[0] if signature else None,
+            "prompt_version": signature[1] if signature else None,
+        }
+
+    def _rejected_before(self, entry, ledger):
+        """
+        此前已判为不相关且标题未变的条目，不再抓取详情页：
+        LLM 结论要求模型与提示词版本未变；本地分类器的结论另要求重新训练次数与阈值未变
+        """
+        row = ledger.get(entry['url'])
+        signature = self._filter_signature()
+        if not (row and signature and row['verdict'] == 0 and row['title_hash'] == text_hash(entry['title'])):
             return False
+        expected = {'llm': signature, 'classifier': self._classifier_signature()}.get(row['reason'])
+        return expected is not None and (row['model'], row['prompt_version']) == expected
+
+    def _select_candidates(self, entries):
+        """列表项前置筛选：去重 + 关键词 + 筛选结论 (关键词不匹配的同样记入结论表)"""
+        processed = self._processed_among([entry['url'] for entry in entries])
+        ledger = self.storage.get_verdicts(
+            [entry['url'] for entry in entries if entry['url'] not in processed]
+        )
+        candidates, rejects = [], []
+        for entry in entries:
+            title = entry['title']
+            logger.debug(f"检查: {title} | {entry['publish_date']}")
             
-        # 1. 检查排除词 (Explicit exclusion)
-        # 只要标题包含任何排除词，立刻判定为不匹配
-        for ex_kw in self.exclude_keywords:
-            if ex_kw in text:
-                logger.debug(f"排除: {text} (包含 '{ex_kw}')")
-                return False
+            # 1. 检查去重 (包括本次运行中其他来源已出现的 URL)
+            if entry['url'] in self._seen_urls or entry['url'] in processed:
+                logger.debug("已跳过(已处理)")
+                continue
+            
+            # 2. 检查日期 (正式运行时应开启)
+            # if not self._is_yesterday(entry['publish_date']):
+            #     logger.debug("已跳过(非昨日)")
+            #     continue
+            
+            # 3. 检查关键词 (作为前置筛选)
+            if not self._match_keywords(title):
+                logger.debug(f"跳过(关键词不匹配): {title}")
+                row = ledger.get(entry['url'])
+                if not (row and row['reason'] == 'keyword' and row['title_hash'] == text_hash(title)):
+                    rejects.append(self._verdict(entry, False, 'keyword'))
+                continue
+            
+            # 4. 此前已被 LLM 判为不相关 (标题、模型、提示词均未变化)
+            if self._rejected_before(entry, ledger):
+                logger.debug(f"跳过(此前已判定不相关): {title}")
+                continue
+            
+            self._verdicts[entry['url']] = ledger.get(entry['url'])
+            self._seen_urls.add(entry['url'])
+            logger.info(f"发现候选政策(待LLM二次筛选): {title}")
+            candidates.append(entry)
+        self.storage.save_verdicts(rejects)
+        return candidates
+
+    async def _http_get(self, url, etag=None, last_modified=None):
+        """限速 + 并发控制下的 HTTP GET，429/5xx 按退避时间重试"""
+        for attempt in range(self.retries):
+            await self.limiter.acquire_async(url)
+            async with self._semaphore:
+                try:
+                    result = await asyncio.to_thread(self.fetcher.fetch, url, etag, last_modified)
+                except requests.HTTPError as e:
+                    resp = e.response
+                    status = resp.status_code if resp is not None else None
+                    if status not in RETRYABLE_STATUS:
+                        raise
+                    self.limiter.report(url, status, resp.headers.get('Retry-After'))
+                    if attempt == self.retries - 1:
+                        raise
+                    continue
+            self.limiter.report(url, result.status_code)
+            return result
+
+    async def _render(self, url, source, wait_idle=False):
+        """限速 + 并发控制下用浏览器打开页面，返回 (html, 实际URL)"""
+        await self.limiter.acquire_async(url)
+        async with self._semaphore:
+            pool = await self._get_page_pool()
+            async with pool.page(allow=source.get('allow_resources')) as page:
+                response = await page.goto(url, timeout=self.timeout)
+                if response is not None:
+                    self.limiter.report(url, response.status, response.headers.get('retry-after'))
                 
-        # 2. 检查包含词 (Inclusion)
-        for kw in self.keywords:
-            if kw in text:
-                return True
-        return False
+                # 等待内容加载 (针对动态网页)
+                if wait_idle:
+                    await page.wait_for_load_state("networkidle")
+                
+                # 获取当前实际URL（处理重定向后的URL），用于相对路径拼接
+                return await page.content(), page.url
+
+    async def _fetch_detail(self, source, url):
+        """获取详情页正文、发布信息及附件链接：优先 HTTP，无正文时回退浏览器渲染"""
+        name = source['name']
+        if self.http_fast_path and not source.get('detail_dynamic', False):
+            try:
+                with metrics.timer('fetch', source=name, page='detail'):
+                    result = await self._http_get(url)
+                if not result.is_html:
+                    # 详情链接本身就是文件 (如 PDF)，按附件处理
+                    logger.info(f"详情页非 HTML ({result.content_type})，按附件提取: {url}")
+                    extracted = self._extract_content("")
+                    extracted['html'] = ""
+                    extracted['attachments'] = [(result.url, os.path.basename(urlparse(result.url).path))]
+                    return extracted
+                with metrics.timer('parse', source=name, page='detail'):
+                    extracted = self._extract_content(result.text)
+                if extracted['text']:
+                    extracted['html'] = result.text
+                    extracted['attachments'] = find_attachments(result.text, result.url)
+                    return extracted
+                logger.debug(f"HTTP 抓取无正文，回退浏览器: {url}")
+            except Exception as e:
+                logger.debug(f"HTTP 抓取失败，回退浏览器 {url}: {e}")
+        
+        with metrics.timer('fetch', source=name, page='detail'):
+            html, current_url = await self._render(url, source)
+        with metrics.timer('parse', source=name, page='detail'):
+            extracted = self._extract_content(html)
+        extracted['html'] = html
+        extracted['attachments'] = find_attachments(html, current_url)
+        return extracted
+
+    async def _attachment_text(self, attachments):
+        """在附件线程池中下载并提取附件文本，不阻塞抓取事件循环"""
+        if not self.attachments.enabled or not attachments:
+            return ""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.attachments.pool, self.attachments.extract_all, attachments)
 
-    def _extract_content(self, page):
-        """提取页面正文纯文本"""
+    async def _cache_page(self, source, entry, html, content, publisher=""):
+        """写入详情页缓存 (压缩在线程中进行)，缓存失败不影响抓取"""
+        if not self.cache.enabled:
+            return
+        meta = {
+            "title": entry['title'],
+            "source_name": source['name'],
+            "publish_date": entry['publish_date'],
+            "publish_date_raw": entry['publish_date_raw'],
+        }
         try:
-            # 简单的正文提取策略：提取 P 标签文本最多的区域，或者直接取 body 文本
-            # 这里简化处理：获取 body 文本，用于 AI 摘要
-            content = page.evaluate("() => document.body.innerText")
-            return content
+            await asyncio.to_thread(self.cache.put, entry['url'], html, content, meta, publisher)
         except Exception as e:
-            logger.error(f"提取正文失败: {e}")
-            return ""
+            logger.warning(f"写入页面缓存失败 {entry['url']}: {e}")
+
+    async def _emit(self, policy):
+        """
+        交付筛选通过的 policy：流水线模式下放入下游队列 (队列满时等待，形成背压) 并返回 None，
+        否则原样返回，由 run() 汇总
+        """
+        if self._sink is None:
+            return policy
+        await self._sink.put(policy)
+        return None
+
+    async def _judge(self, title, content):
+        """
+        LLM 相关性判断。开启批量筛选 (summary.batch_size > 1) 时先进入批次，
+        凑满 batch_size 条或等待 batch_wait 秒后一起提交
+        """
+        loop = asyncio.get_running_loop()
+        pool = getattr(self.summarizer, 'pool', None)
+        if self.batch_size <= 1:
+            return await loop.run_in_executor(pool, self.summarizer.check_policy_relevance, title, content)
+        
+        future = loop.create_future()
+        self._batch.append((title, content, future))
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = loop.call_later(self.batch_wait, self._flush_batch)
+        return await future
+
+    def _flush_batch(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        items = [(str(i), title, content) for i, (title, content, _) in enumerate(batch, 1)]
+        try:
+            verdicts = await asyncio.get_running_loop().run_in_executor(
+                getattr(self.summarizer, 'pool', None), self.summarizer.check_policy_relevance_batch, items
+            )
+        except Exception as e:
+            logger.error(f"批量筛选失败: {e}")
+            verdicts = {}
+        logger.info(f"批量筛选 {len(batch)} 条候选")
+        for (item_id, _, _), (_, _, future) in zip(items, batch):
+            if not future.done():
+                future.set_result(verdicts.get(item_id))
+
+    def _to_policy(self, source_name, entry, content, keywords):
+        return {
+            "title": entry['title'],
+            "source_name": source_name,
+            "publish_date": entry['publish_date'],
+            "publish_date_raw": entry['publish_date_raw'],
+            "url": entry['url'],
+            "keywords": keywords,
+            "content": content # 暂存内容用于生成摘要，不存入DB
+        }
+
+    async def _crawl_detail(self, source, entry):
+        """
+        抓取详情页正文并进行 LLM 筛选，返回 policy 或 None
+        每个阶段 (fetched / filtered) 完成后写入 frontier；entry 带 content 时表示已抓取过，直接筛选
+        """
+        title = entry['title']
+        full_url = entry['url']
+        try:
+            content = entry.get('content')
+            if content is None:
+                extracted = await self._fetch_detail(source, full_url)
+                content = extracted['text']
+                entry['publisher'] = extracted['publisher']
+                # 政策原文常以附件形式发布，附件文本接在正文之后
+                with metrics.timer('attachments', source=source['name']):
+                    attachment_text = await self._attachment_text(extracted['attachments'])
+                if attachment_text:
+                    content = f"{content}\n\n{attachment_text}" if content else attachment_text
+                # 列表页没有日期时使用详情页 meta 中的发布日期
+                entry['publish_date'] = entry['publish_date'] or extracted['publish_date']
+                self.storage.frontier_update(
+                    full_url, 'fetched', content=content, publish_date=entry['publish_date'],
+                    publisher=entry['publisher']
+                )
+                await self._cache_page(source, entry, extracted['html'], content, entry['publisher'])
+            # 发布机构/日期只放在 LLM 筛选输入的正文前，帮助判断是否为官方政策原文
+            llm_content = format_content(content, entry.get('publisher'), entry['publish_date'])
+            
+            # LLM 智能筛选 (同步调用放入线程，避免阻塞事件循环)
+            is_relevant = False
+            analysis = None
+            previous = self._verdicts.pop(full_url, None)
+            signature = self._filter_signature()
+            if (
+                previous and signature and previous['reason'] == 'llm'
+                and previous['content_hash'] == text_hash(content)
+                and (previous['model'], previous['prompt_version']) == signature
+            ):
+                # 正文与筛选配置均未变化，沿用上次结论
+                is_relevant = bool(previous['verdict'])
+            elif self.summarizer:
+                # 本地分类器高置信度时直接给出结论，只有中间地带 (及抽检样本) 调用 LLM
+                decision, probability = self.classifier.decide(title, content) if signature else (None, None)
+                if decision is not None:
+                    logger.info(f"本地分类器{'通过' if decision else '排除'} (p={probability:.3f}): {title}")
+                    is_relevant = decision
+                    self.storage.save_verdicts([self._verdict(entry, is_relevant, 'classifier', content)])
+                elif source.get('level') != 'national' and getattr(self.summarizer, 'budget_state', 'ok') != 'ok':
+                    # token 预算紧张：余量留给国家级来源，其余候选停留在 fetched 阶段，下次运行再筛选
+                    logger.warning(f"LLM 预算紧张，推迟非国家级来源的筛选: {title}")
+                    metrics.incr('items', source=source['name'], status='deferred')
+                    self._failed_sources.add(source['url'])
+                    return None
+                else:
+                    # 传入标题和正文进行判断 (在 LLM 线程池中执行，并发数由 llm.concurrency 控制)
+                    if getattr(self.summarizer, 'combined', False):
+                        # 合并模式：筛选与摘要一次完成
+                        analysis = await asyncio.get_running_loop().run_in_executor(
+                            self.summarizer.pool, self.summarizer.analyze_policy, title, llm_content
+                        )
+                        is_relevant = analysis['is_relevant'] if analysis else None
+                    else:
+                        is_relevant = await self._judge(title, llm_content)
+                    if is_relevant is None:
+                        # 重试后仍未得到结论：停留在 fetched 阶段，不记录指纹，下次运行 (或 --resume) 重新判断
+                        logger.warning(f"⚠️ 筛选未完成，下次运行重试: {title}")
+                        self._failed_sources.add(source['url'])
+                        return None
+                    if signature:
+                        self.storage.save_verdicts([self._verdict(entry, is_relevant, 'llm', content)])
+                        # LLM 结论即标注：评估并增量训练本地分类器
+                        self.classifier.evaluate(probability, is_relevant)
+                        self.classifier.learn(title, content, is_relevant)
+            else:
+                # 如果没有 summarizer，则默认通过
+                is_relevant = True
+            
+            # 记录标题与正文命中的关键词 (正文不做排除词判断，页脚等区域常含“解读”等字样)
+            title_keywords, _ = self.matcher.find(title)
+            content_keywords, _ = self.matcher.find(content)
+            keywords = ",".join(kw for kw in self.keywords if kw in title_keywords or kw in content_keywords)
+            self.storage.frontier_update(
+                full_url, 'filtered', is_relevant=int(bool(is_relevant)), keywords=keywords
+            )
+            
+            if is_relevant:
+                logger.info(f"✅ 筛选通过: {title}")
+                metrics.incr('items', source=source['name'], status='kept')
+                policy = self._to_policy(source['name'], entry, content, keywords)
+                if analysis and analysis['summary']:
+                    fields = {key: analysis[key] for key in ('summary', 'key_metrics', 'deadlines')}
+                    policy.update(fields)
+                    self.storage.frontier_update(full_url, 'summarized', **fields)
+                return await self._emit(policy)
+            logger.info(f"❌ 筛选不通过: {title}")
+        except Exception as e:
+            logger.error(f"抓取详情页失败 {full_url}: {e}")
+            metrics.incr('items', source=source['name'], status='failed')
+            self._failed_sources.add(source['url'])
+        return None
+
+    async def _resume_frontier(self):
+        """续跑上次中断的任务：已抓取的不再抓取，已筛选通过的直接返回"""
+        sources_by_name = {source['name']: source for source in self.sources}
+        tasks, policies = [], []
+        for row in self.storage.frontier_pending():
+            entry = {key: row[key] for key in ('title', 'url', 'publish_date', 'publish_date_raw')}
+            entry['publish_date'] = entry['publish_date'] or ""
+            source = sources_by_name.get(row['source_name'], {"name": row['source_name'], "url": ""})
+            if row['stage'] == 'discovered':
+                tasks.append(self._crawl_detail(source, entry))
+            elif row['stage'] == 'fetched':
+                entry['content'] = row['content'] or ""
+                entry['publisher'] = row['publisher'] or ""
+                tasks.append(self._crawl_detail(source, entry))
+            elif row['stage'] == 'filtered':
+                policies.append(self._to_policy(row['source_name'], entry, row['content'] or "", row['keywords']))
+        if tasks or policies:
+            logger.info(f"续跑上次任务: 待抓取/筛选 {len(tasks)} 条，已筛选通过 {len(policies)} 条")
+        policies = [await self._emit(policy) for policy in policies]
+        results = await asyncio.gather(*tasks)
+        return [p for p in policies + results if p]
+
+    def _config_digest(self, source):
+        """关键词、选择器与筛选模型/提示词版本的摘要：配置变化后已跳过的旧条目需要重新筛选"""
+        config_text = json.dumps(
+            [self.keywords, self.exclude_keywords, source['selectors'], self._filter_signature()],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha1(config_text.encode('utf-8')).hexdigest()[:12]
+
+    def _fingerprint(self, source, entries):
+        """列表指纹：对 selectors.item 匹配到的条目 (链接/标题/日期) 做哈希，忽略页面其他区域的变动"""
+        digest = hashlib.sha1()
+        for entry in entries:
+            digest.update(f"{entry['url']}|{entry['title']}|{entry['publish_date']}\n".encode('utf-8'))
+        return f"{self._config_digest(source)}:{digest.hexdigest()}"
 
-    def run(self):
-        new_policies = []
+    def _next_page_url(self, source, html, page_url, page_no):
+        """
+        计算第 page_no + 1 页的地址
+        pagination.next: 下一页链接的选择器；pagination.url_template: 如 "index_{page}.html" (相对来源 url)
+        """
+        pagination = source.get('pagination')
+        if not pagination:
+            return None
+        if pagination.get('next'):
+            soup = BeautifulSoup(html, 'lxml')
+            link_el = soup.select_one(pagination['next'])
+            href = link_el.get('href') if link_el else None
+            if not href or href.startswith(('javascript:', '#')):
+                return None
+            next_url = urljoin(page_url, href)
+            return next_url if next_url != page_url else None
+        if pagination.get('url_template'):
+            # 常见政府网站分页: index.html, index_1.html, index_2.html ...
+            page = pagination.get('start', 1) + page_no - 1
+            return urljoin(source['url'], pagination['url_template'].format(page=page))
+        return None
+
+    async def _load_list(self, source, url, page_no=1, state=None):
+        """
+        获取并解析列表页：静态来源先走 HTTP (带条件请求)，解析不到列表项时回退浏览器
+        返回 (entries, 校验头, 下一页地址)；服务器返回 304 时 entries 为 None
+        """
+        state = state or {}
+        if self.http_fast_path and not source.get('is_dynamic', False):
+            try:
+                with metrics.timer('fetch', source=source['name'], page='list'):
+                    result = await self._http_get(url, state.get('etag'), state.get('last_modified'))
+                if result.not_modified:
+                    return None, state, None
+                with metrics.timer('parse', source=source['name'], page='list'):
+                    entries = self._parse_list(result.text, result.url, source)
+                if entries:
+                    validators = {"etag": result.etag, "last_modified": result.last_modified}
+                    return entries, validators, self._next_page_url(source, result.text, result.url, page_no)
+                logger.info(f"HTTP 抓取未解析到列表项，回退浏览器: {source['name']}")
+            except Exception as e:
+                logger.warning(f"HTTP 抓取失败，回退浏览器 {url}: {e}")
         
-        with sync_playwright() as p:
-            # 启动浏览器
-            browser = p.chromium.launch(
-                headless=self.config['crawler'].get('headless', True)
+        with metrics.timer('fetch', source=source['name'], page='list'):
+            html, current_page_url = await self._render(
+                url, source, wait_idle=source.get('is_dynamic', False)
             )
-            context = browser.new_context()
+        with metrics.timer('parse', source=source['name'], page='list'):
+            entries = self._parse_list(html, current_page_url, source)
+        return entries, {}, self._next_page_url(source, html, current_page_url, page_no)
+
+    def _reached_known(self, entries, watermark):
+        """
+        判断是否已翻到上次抓取过的位置
+        只看页面最后一条 (置顶条目在页首，不影响判断)：已处理、在上次首页中或早于 horizon
+        """
+        last = entries[-1]
+        if last['url'] in watermark or self._processed_among([last['url']]):
+            return True
+        if self.horizon_days:
+            last_date = parse_date(last['publish_date'])
+            horizon = datetime.now().date() - timedelta(days=self.horizon_days)
+            if last_date and last_date < horizon:
+                return True
+        return False
+
+    async def _walk_pages(self, source, entries, next_url, watermark):
+        """从第 2 页开始向后翻页，直到遇到已知条目、超出时间范围或达到页数上限"""
+        max_pages = source.get('pagination', {}).get('max_pages', self.max_pages)
+        horizon = datetime.now().date() - timedelta(days=self.horizon_days) if self.horizon_days else None
+        older_entries = []
+        page_no = 1
+        while next_url and page_no < max_pages and not self._reached_known(entries, watermark):
+            page_no += 1
+            try:
+                entries, _, next_url = await self._load_list(source, next_url, page_no)
+            except Exception as e:
+                logger.warning(f"加载第 {page_no} 页失败 {source['name']}: {e}")
+                break
+            if not entries:
+                break
+            logger.info(f"翻页补抓: {source['name']} 第 {page_no} 页")
+            for entry in entries:
+                entry_date = parse_date(entry['publish_date'])
+                if horizon and entry_date and entry_date < horizon:
+                    continue
+                older_entries.append(entry)
+        return older_entries
+
+    async def _crawl_source(self, source):
+        """抓取单个来源：列表页 -> 候选详情页 (并发，同域名受限速约束)"""
+        try:
+            logger.info(f"正在抓取: {source['name']} ({source['url']})")
+            state = self.storage.get_source_state(source['url']) if self.skip_unchanged else None
+            if state and not (state.get('fingerprint') or '').startswith(self._config_digest(source) + ':'):
+                state = None # 筛选配置已变化，不能沿用上次的结论
+            try:
+                entries, validators, next_url = await self._load_list(source, source['url'], 1, state)
+            except Exception as page_e:
+                logger.error(f"加载页面失败 {source['url']}: {page_e}")
+                return []
             
-            for source in self.sources:
-                try:
-                    logger.info(f"正在抓取: {source['name']} ({source['url']})")
-                    page = context.new_page()
-                    try:
-                        page.goto(source['url'], timeout=self.config['crawler'].get('timeout', 30000))
-                        
-                        # 等待内容加载 (针对动态网页)
-                        if source.get('is_dynamic', False):
-                            page.wait_for_load_state("networkidle")
-                            time.sleep(2) # 额外等待
-                        
-                        # 获取页面内容给 BS4 解析
-                        html = page.content()
-                        # 获取当前实际URL（处理重定向后的URL），用于相对路径拼接
-                        current_page_url = page.url
-                        soup = BeautifulSoup(html, 'lxml')
-                        
-                        selectors = source['selectors']
-                        items = soup.select(selectors['item'])
-                        
-                        logger.info(f"找到 {len(items)} 个列表项")
-                        
-                        for item in items:
-                            try:
-                                # 提取链接
-                                link_el = item.select_one(selectors['link'])
-                                if not link_el: continue
-                                href = link_el.get('href')
-                                # 使用实际页面 URL 作为 Base URL
-                                full_url = urljoin(current_page_url, href)
-                                
-                                # 提取标题
-                                title_el = item.select_one(selectors['title'])
-                                title = title_el.get_text(strip=True) if title_el else ""
-                                
-                                # 提取日期
-                                date_el = item.select_one(selectors['date'])
-                                date_str = date_el.get_text(strip=True) if date_el else ""
-                                
-                                # 尝试从URL提取日期 (如果不包含有效日期文本)
-                                if not date_str and full_url:
-                                    # Pattern 1: /2022/4/24/
-                                    m1 = re.search(r'/(\d{4})/(\d{1,2})/(\d{1,2})/', full_url)
-                                    if m1:
-                                        date_str = f"{m1.group(1)}-{m1.group(2).zfill(2)}-{m1.group(3).zfill(2)}"
-                                    else:
-                                        # Pattern 2: /t20260123_ or /20260123/
-                                        m2 = re.search(r'[t/](\d{4})(\d{2})(\d{2})[_/.]', full_url)
-                                        if m2:
-                                            date_str = f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}"
-
-                                logger.debug(f"检查: {title} | {date_str}")
-                                
-                                # 1. 检查去重
-                                if self.storage.is_processed(full_url):
-                                    logger.debug("已跳过(已处理)")
-                                    continue
-                                
-                                # 2. 检查日期 (正式运行时应开启)
-                                # if not self._is_yesterday(date_str):
-                                #     logger.debug("已跳过(非昨日)")
-                                #     continue
-                                
-                                # 3. 检查关键词 (作为前置筛选)
-                                if not self._match_keywords(title):
-                                    logger.debug(f"跳过(关键词不匹配): {title}")
-                                    continue
-                                    
-                                logger.info(f"发现候选政策(待LLM二次筛选): {title}")
-                                
-                                # 进入详情页抓取正文
-                                # 为了防止爬虫过快被封，稍微暂停
-                                time.sleep(1)
-                                try:
-                                    detail_page = context.new_page()
-                                    detail_page.goto(full_url, timeout=30000)
-                                    content = self._extract_content(detail_page)
-                                    detail_page.close()
-                                    
-                                    # LLM 智能筛选
-                                    is_relevant = False
-                                    if self.summarizer:
-                                        # 传入标题和正文进行判断
-                                        is_relevant = self.summarizer.check_policy_relevance(title, content)
-                                    else:
-                                        # 如果没有 summarizer，回退到关键词或默认通过
-                                        # 这里既然移除了关键词检查，若无 LLM 则默认通过
-                                        is_relevant = True
-                                    
-                                    if is_relevant:
-                                        logger.info(f"✅ 筛选通过: {title}")
-                                        policy = {
-                                            "title": title,
-                                            "source_name": source['name'],
-                                            "publish_date": date_str,
-                                            "url": full_url,
-                                            "content": content # 暂存内容用于生成摘要，不存入DB
-                                        }
-                                        new_policies.append(policy)
-                                    else:
-                                        logger.info(f"❌ 筛选不通过: {title}")
-                                    
-                                except Exception as e:
-                                    logger.error(f"抓取详情页失败 {full_url}: {e}")
-                                    
-                            except Exception as item_e:
-                                logger.error(f"解析列表项失败: {item_e}")
-                                continue
-                                
-                    except Exception as page_e:
-                        logger.error(f"加载页面失败 {source['url']}: {page_e}")
-                    finally:
-                        page.close()
-                        
-                except Exception as source_e:
-                    logger.error(f"处理源 {source['name']} 失败: {source_e}")
+            if entries is None:
+                logger.info(f"列表页未更新 (304)，跳过: {source['name']}")
+                metrics.incr('unchanged', source=source['name'], reason='not_modified')
+                return []
+            fingerprint = self._fingerprint(source, entries)
+            if state and state.get('fingerprint') == fingerprint:
+                logger.info(f"列表页无变化，跳过: {source['name']}")
+                metrics.incr('unchanged', source=source['name'], reason='fingerprint')
+                self._pending_states[source['url']] = dict(
+                    validators, fingerprint=fingerprint, watermark=state.get('watermark')
+                )
+                return []
+            
+            # 首页之后的页面：补抓上次运行以来被挤出首页的条目
+            watermark = set(state.get('watermark') or []) if state else set()
+            first_page = entries
+            entries = first_page + await self._walk_pages(source, first_page, next_url, watermark)
             
-            browser.close()
+            candidates = self._select_candidates(entries)
+            self.storage.frontier_add(source['name'], candidates)
             
-        return new_policies
+            results = await asyncio.gather(
+                *(self._crawl_detail(source, entry) for entry in candidates)
+            )
+            # 所有候选处理成功才记录指纹，否则下次运行需要重新检查该来源
+            if entries and source['url'] not in self._failed_sources:
+                self._pending_states[source['url']] = dict(
+                    validators, fingerprint=fingerprint, watermark=[e['url'] for e in first_page]
+                )
+            metrics.incr('items', len(entries), source=source['name'], status='seen')
+            metrics.incr('items', len(entries) - len(candidates), source=source['name'], status='skipped')
+            return [p for p in results if p]
+        except Exception as source_e:
+            logger.error(f"处理源 {source['name']} 失败: {source_e}")
+            return []
+
+    async def run_async(self, resume=False, sink=None):
+        """
+        并发抓取所有来源，返回通过筛选的 policy 列表 (按来源顺序)
+        resume=True 时先续跑 frontier 中上次未完成的候选，且不会重复发现它们
+        sink 为 asyncio.Queue 时，每条 policy 通过筛选后立即放入队列，返回空列表
+        """
+        self._sink = sink
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._browser_lock = asyncio.Lock()
+        self._playwright = self._browser = self._context = self._page_pool = None
+        self._seen_urls = set()
+        self._verdicts = {}
+        self._batch, self._batch_timer, self._batch_tasks = [], None, set()
+        self._failed_sources = set()
+        self._pending_states = {}
+        if self.preload_urls:
+            self._known_urls = await asyncio.to_thread(self.storage.load_processed_urls)
+            logger.info(f"已载入 {len(self._known_urls)} 条已处理 URL")
+        
+        # 国家级来源先启动 (先拿到并发名额与 LLM 预算)，结果仍按来源顺序返回
+        ordered = sorted(range(len(self.sources)), key=lambda i: self.sources[i].get('level') != 'national')
+        tasks = [self._crawl_source(self.sources[i]) for i in ordered]
+        if resume:
+            self._seen_urls.update(self.storage.frontier_urls())
+            tasks.insert(0, self._resume_frontier())
+            ordered.insert(0, -1)
+        
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            await self._close_browser()
+            # 附件提取线程池与其共用的 HTTP 连接池
+            self.attachments.close()
+            self.fetcher.close()
+            self._finish_classifier()
+        
+        results = [policies for _, policies in sorted(zip(ordered, results), key=lambda pair: pair[0])]
+        return [policy for source_policies in results for policy in source_policies]
+
+    def _finish_classifier(self):
+        """保存本次增量训练结果，并输出分类器的决策分布与抽检得到的自动通过/排除 precision"""
+        if not self.classifier.enabled:
+            return
+        self.classifier.save()
+        stats = self.classifier.summary()
+        for key in ('auto_accept', 'auto_reject', 'llm', 'audit'):
+            metrics.incr('classifier', stats[key], decision=key)
+        for key in ('accept_tp', 'accept_fp', 'reject_tn', 'reject_fn'):
+            metrics.incr('classifier_eval', stats[key], outcome=key)
+        logger.info(
+            f"本地分类器：自动通过 {stats['auto_accept']}，自动排除 {stats['auto_reject']}，"
+            f"交给 LLM {stats['llm']}，抽检 {stats['audit']}；"
+            f"自动通过 precision={stats['accept_precision']}，自动排除 precision={stats['reject_precision']} "
+            f"(阈值 {stats['reject_threshold']}/{stats['accept_threshold']})"
+        )
+
+    def run(self, resume=False):
+        return asyncio.run(self.run_async(resume))
+
+    def mark_failed(self, source_name):
+        """下游阶段 (摘要/入库) 处理失败时调用，本次不记录该来源的列表指纹"""
+        for source in self.sources:
+            if source['name'] == source_name:
+                self._failed_sources.add(source['url'])
+
+    def commit_source_states(self):
+        """
+        持久化本次运行的列表页指纹
+        需在新政策保存入库之后调用，避免任务中途失败导致下次运行误判“无变化”而漏抓
+        """
+        for url, state in self._pending_states.items():
+            if url in self._failed_sources:
+                continue
+            self.storage.save_source_state(
+                url, state['fingerprint'], state.get('etag'), state.get('last_modified'),
+                state.get('watermark')
+            )
+        self._pending_states = {}
@@ -0,0 +1,181 @@
+import re
+from lxml import html as lxml_html
+from lxml.etree import ParserError
+from .utils import logger, normalize_date
+
+# XHTML 模板开头的 XML 声明：lxml 不接受带编码声明的 str，文本已解码，直接去掉
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>', re.I)
+# 不可见内容
+INVISIBLE_TAGS = ['script', 'style', 'noscript', 'template']
+# 与正文无关的标签
+BOILERPLATE_TAGS = ['iframe', 'form', 'select', 'button', 'nav', 'header', 'footer', 'aside']
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'li', 'tr', 'table', 'section', 'article', 'pre', 'blockquote',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'dl', 'dd', 'dt',
+}
+# 段落候选：自身直接包含文本的块
+PARAGRAPH_TAGS = {'p', 'pre', 'td', 'div', 'span', 'font', 'li', 'section'}
+
+# class / id 提示：政府网站常见的导航、面包屑 (当前位置)、相关链接、分享、版权等区域
+NEGATIVE_RE = re.compile(
+    r'nav|menu|footer|header|breadcrumb|crumb|sidebar|related|xgwz|xglj|share|'
+    r'copyright|position|location|dqwz|bottom|banner|toolbar|print|comment|search|login',
+    re.I
+)
+# 政府网站正文容器常见命名 (TRS_Editor / zoom / pages_content / article-content ...)
+POSITIVE_RE = re.compile(r'trs_editor|zoom|article|content|detail|main|text|zw', re.I)
+PUNCTUATION_RE = re.compile(r'[，。；：、,.;:]')
+
+# 正文过短时视为提取失败，回退到整页文本
+MIN_CONTENT_CHARS = 100
+
+# 政府网站详情页常用的 meta 标签
+META_TITLE = ['ArticleTitle', 'og:title', 'title']
+META_PUBLISHER = ['ContentSource', 'publisher', 'author', 'og:site_name', 'SiteName']
+META_DATE = ['PubDate', 'firstpublishedtime', 'publishdate', 'article:published_time']
+
+
+def _meta(doc, names):
+    for name in names:
+        for attr in ('name', 'property'):
+            values = doc.xpath(f'//meta[translate(@{attr}, "ABCDEFGHIJKLMNOPQRSTUVWXYZ", '
+                               f'"abcdefghijklmnopqrstuvwxyz")="{name.lower()}"]/@content')
+            for value in values:
+                if value.strip():
+                    return value.strip()
+    return ""
+
+
+def _hints(el):
+    return f"{el.get('class', '')} {el.get('id', '')}"
+
+
+def _own_text(el):
+    """元素自身 (不含子块) 的文本长度"""
+    length = len((el.text or '').strip())
+    for child in el:
+        if child.tag not in BLOCK_TAGS:
+            length += len((child.text_content() or '').strip())
+        length += len((child.tail or '').strip())
+    return length
+
+
+def _link_density(el):
+    text_length = len(el.text_content().strip())
+    if not text_length:
+        return 1.0
+    link_length = sum(len(a.text_content().strip()) for a in el.iter('a'))
+    return link_length / text_length
+
+
+def _block_text(el):
+    """按块级元素换行输出文本，近似浏览器的 innerText"""
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str):
+            if node.tail:
+                parts.append(node.tail)
+            return
+        is_block = node.tag in BLOCK_TAGS
+        if is_block:
+            parts.append("\n")
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+        if is_block:
+            parts.append("\n")
+        if node.tail:
+            parts.append(node.tail)
+
+    walk(el)
+    lines = (line.strip() for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _clean(doc):
+    for el in list(doc.iter(*BOILERPLATE_TAGS)):
+        el.drop_tree()
+    for el in list(doc.iter()):
+        if not isinstance(el.tag, str) or el.tag in ('html', 'body'):
+            continue
+        hints = _hints(el)
+        if NEGATIVE_RE.search(hints) and not POSITIVE_RE.search(hints) and _link_density(el) > 0.3:
+            el.drop_tree()
+
+
+def _best_candidate(doc):
+    """段落打分后累加到父节点 (全额) 和祖父节点 (半额)，按链接密度折算后取最高分"""
+    scores = {}
+    for el in doc.iter(*PARAGRAPH_TAGS):
+        length = _own_text(el)
+        if length < 20:
+            continue
+        text = el.text_content()
+        score = 1 + len(PUNCTUATION_RE.findall(text)) + min(length // 100, 3)
+        parent = el.getparent()
+        for node, weight in ((el, 1.0), (parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+            if node is None or not isinstance(node.tag, str):
+                continue
+            if node not in scores:
+                scores[node] = 25.0 if POSITIVE_RE.search(_hints(node)) else 0.0
+            scores[node] += score * weight
+    if not scores:
+        return None
+    return max(scores, key=lambda node: scores[node] * (1 - _link_density(node)))
+
+
+def parse_html(html):
+    """
+    解析详情页 HTML；XHTML 页面开头带编码的 XML 声明时 lxml 拒绝解析 str，先去掉声明
+    解析失败时抛出 ParserError / ValueError
+    """
+    return lxml_html.document_fromstring(XML_DECLARATION_RE.sub('', html, count=1))
+
+
+def extract_main_content(html):
+    """
+    提取详情页正文与发布信息 (标题/发布机构/发布日期)
+    返回 {"text", "title", "publisher", "publish_date"}，正文提取失败时 text 为整页文本
+    """
+    result = {"text": "", "title": "", "publisher": "", "publish_date": ""}
+    if not html or not html.strip():
+        return result
+    try:
+        doc = parse_html(html)
+    except (ParserError, ValueError) as e:
+        logger.warning(f"详情页 HTML 解析失败: {e}")
+        return result
+
+    result['title'] = _meta(doc, META_TITLE)
+    result['publisher'] = _meta(doc, META_PUBLISHER)
+    result['publish_date'] = normalize_date(_meta(doc, META_DATE)) or ""
+
+    for el in list(doc.iter(*INVISIBLE_TAGS)):
+        el.drop_tree()
+    body = doc.find('body')
+    if body is None:
+        body = doc
+    full_text = _block_text(body)
+    
+    _clean(doc)
+    best = _best_candidate(doc)
+    text = _block_text(best) if best is not None else ""
+    result['text'] = text if len(text) >= MIN_CONTENT_CHARS else full_text
+    return result
+
+
+def format_content(content, publisher="", publish_date=""):
+    """
+    将发布信息置于正文前，仅用于送入 LLM 的筛选提示 (帮助判断是否为官方政策原文)
+    入库、摘要与检索索引使用的正文不含这些信息
+    """
+    header = []
+    if publisher:
+        header.append(f"发布机构：{publisher}")
+    if publish_date:
+        header.append(f"发布日期：{publish_date}")
+    if not header:
+        return content
+    return "\n".join(header) + "\n\n" + content
@@ -0,0 +1,109 @@
+import re
+import requests
+from requests.adapters import HTTPAdapter
+from .utils import logger
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# <meta charset="gbk"> 或 <meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w-]+)', re.I)
+
+# 常见的编码别名统一到超集，避免生僻字乱码
+CHARSET_ALIASES = {
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+    "iso-8859-1": "utf-8", # 服务端未声明编码时 requests 的默认值，不可信
+}
+
+
+class FetchResult:
+    def __init__(self, url, status_code, text, headers):
+        self.url = url # 重定向后的最终 URL
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+    @property
+    def etag(self):
+        return self.headers.get('ETag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('Last-Modified')
+
+    @property
+    def content_type(self):
+        return self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+    @property
+    def is_html(self):
+        return self.content_type in ('', 'text/html', 'application/xhtml+xml', 'text/plain')
+
+
+class HttpFetcher:
+    """基于 requests 连接池的静态页面抓取器 (keep-alive / gzip / 编码识别)"""
+
+    def __init__(self, config):
+        crawler_config = config.get('crawler', {})
+        self.timeout = crawler_config.get('timeout', 30000) / 1000
+        pool_size = max(1, int(crawler_config.get('concurrency', 4)))
+        
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _detect_encoding(self, resp):
+        """编码识别顺序: HTTP 头 -> HTML meta -> 内容推测"""
+        content_type = resp.headers.get('Content-Type', '')
+        if 'charset=' in content_type.lower():
+            encoding = resp.encoding
+        else:
+            match = META_CHARSET_RE.search(resp.content[:4096])
+            if match:
+                encoding = match.group(1).decode('ascii', 'ignore')
+            else:
+                encoding = resp.apparent_encoding
+        encoding = (encoding or 'utf-8').lower()
+        return CHARSET_ALIASES.get(encoding, encoding)
+
+    def fetch(self, url, etag=None, last_modified=None):
+        """
+        GET 页面并解码为文本，4xx/5xx 状态抛出 requests.HTTPError
+        传入 etag / last_modified 时发送条件请求，未变化时返回 status_code=304 且 text 为空
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        # stream=True: 非 HTML 响应 (如 PDF 附件) 不下载正文
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            
+            result = FetchResult(resp.url, resp.status_code, "", resp.headers)
+            if result.is_html and not result.not_modified:
+                encoding = self._detect_encoding(resp)
+                try:
+                    result.text = resp.content.decode(encoding, errors='replace')
+                except LookupError:
+                    logger.debug(f"未知编码 {encoding}，使用 utf-8 解码: {url}")
+                    result.text = resp.content.decode('utf-8', errors='replace')
+        return result
+
+    def close(self):
+        self.session.close()
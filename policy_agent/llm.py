@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from openai import OpenAI, APIConnectionError, APIStatusError
+from .metrics import metrics
+from .throttle import TokenBucket, RETRYABLE_STATUS
+from .utils import logger
+
+
+class LLMCache:
+    """
+    LLM 响应缓存 (SQLite)：以 模型 + 归一化后的消息 + 调用参数 + 提示词版本 为键
+    过期 (ttl_days) 的条目视为未命中；总大小超过 max_mb 时按最近访问时间淘汰
+    """
+
+    def __init__(self, config):
+        self.config = config.get('llm_cache', {})
+        self.enabled = self.config.get('enabled', True)
+        self.path = self.config.get('path', '.cache/llm_cache.db')
+        self.ttl = self.config.get('ttl_days', 30) * 86400
+        self.max_bytes = self.config.get('max_mb', 100) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    task TEXT,
+                    prompt_version TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+            conn.commit()
+            conn.close()
+
+    @staticmethod
+    def make_key(model, messages, params, prompt_version):
+        """消息内容去掉首尾空白并合并连续空白，避免排版差异导致未命中"""
+        normalized = [
+            {"role": m['role'], "content": re.sub(r'\s+', ' ', m['content']).strip()}
+            for m in messages
+        ]
+        payload = json.dumps(
+            [model, normalized, params, prompt_version], ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, model, task):
+        if not self.enabled:
+            return None
+        conn = sqlite3.connect(self.path)
+        row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[1] > self.ttl:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            row = None
+        elif row:
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        conn.close()
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.incr('llm_cache', model=model, task=task, result='hit' if row else 'miss')
+        return row[0] if row else None
+
+    def put(self, key, model, task, prompt_version, response):
+        if not self.enabled:
+            return
+        now = time.time()
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            INSERT OR REPLACE INTO llm_cache
+            (key, model, task, prompt_version, response, size, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (key, model, task, prompt_version, response, len(response.encode('utf-8')), now, now))
+        conn.commit()
+        self._evict(conn)
+        conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.commit()
+        logger.info(f"LLM 缓存超出容量，已淘汰 {evicted} 条")
+
+
+# CJK 字符 (含中文标点) 约 1 字 1 token，其余字符约 4 个 1 token
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗估文本的 token 数 (不依赖具体模型的分词器)"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def trim_to_tokens(text, max_tokens):
+    """按估算 token 数截断文本 (代替按字符截断，中英文混排时预算更准确)"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text or ""
+    used = 0.0
+    for i, char in enumerate(text):
+        used += 1.0 if _CJK_RE.match(char) else 0.25
+        if used > max_tokens:
+            return text[:i]
+    return text
+
+
+class BudgetExceeded(Exception):
+    """LLM token 预算已用完"""
+
+
+class TokenBudget:
+    """
+    LLM token 预算：单次运行上限 (per_run_tokens) 与每日上限 (per_day_tokens)，0 表示不限
+    每日用量按 日期/模型/任务 持久化到政策数据库的 llm_usage 表 (经传入的 Storage 的线程连接写入，
+    连接由调用方关闭)；未传入 storage 时只在内存中统计。用量超过 low_ratio 时进入"紧张"状态，由调用方降级
+    """
+
+    def __init__(self, config, storage=None):
+        self.config = config.get('llm', {}).get('budget', {}) or {}
+        self.run_limit = int(self.config.get('per_run_tokens', 0) or 0)
+        self.day_limit = int(self.config.get('per_day_tokens', 0) or 0)
+        self.low_ratio = self.config.get('low_ratio', 0.8)
+        self.storage = storage
+        self.run_used = 0
+        self._lock = threading.Lock()
+        self.day = date.today().isoformat()
+        self.day_used = storage.llm_usage_total(self.day) if storage is not None else 0
+
+    def record(self, model, task, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.run_used += prompt_tokens + completion_tokens
+            self.day_used += prompt_tokens + completion_tokens
+        if self.storage is not None:
+            self.storage.record_llm_usage(self.day, model, task, prompt_tokens, completion_tokens)
+
+    @property
+    def used_ratio(self):
+        ratios = [0.0]
+        if self.run_limit:
+            ratios.append(self.run_used / self.run_limit)
+        if self.day_limit:
+            ratios.append(self.day_used / self.day_limit)
+        return max(ratios)
+
+    @property
+    def state(self):
+        """ok / low (超过 low_ratio，只保留筛选调用) / exhausted (拒绝新的调用)"""
+        ratio = self.used_ratio
+        if ratio >= 1:
+            return 'exhausted'
+        return 'low' if ratio >= self.low_ratio else 'ok'
+
+    def summary(self):
+        return {
+            "state": self.state,
+            "run_used": self.run_used,
+            "run_limit": self.run_limit or None,
+            "day_used": self.day_used,
+            "day_limit": self.day_limit or None,
+        }
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class LLMClient:
+    """
+    OpenAI 兼容客户端的统一入口 (摘要/筛选、来源识别、政策问答、向量索引共用)
+    - 相同请求直接返回缓存结果
+    - 按模型限制每分钟请求数/token 数 (llm.limits)，429/5xx/超时按指数退避 + 随机抖动重试
+    - pool 为 LLM 专用线程池 (大小即最大并发)，异步代码通过 run_in_executor 提交调用
+    - 每次实际调用记录耗时、token 用量与失败次数，并计入 token 预算 (用量写入 storage 的数据库)；预算用完后抛出 BudgetExceeded
+    """
+
+    def __init__(self, config, storage=None):
+        summary_config = config.get('summary', {})
+        self.config = config.get('llm', {})
+        self.max_retries = max(0, int(self.config.get('max_retries', 4)))
+        self.backoff_base = self.config.get('backoff_base', 1.0)
+        self.backoff_max = self.config.get('backoff_max', 30.0)
+        self.limits = self.config.get('limits', {}) or {}
+        self.client = OpenAI(
+            api_key=summary_config.get('api_key'),
+            base_url=summary_config.get('base_url', "https://api.openai.com/v1"),
+            timeout=self.config.get('timeout', 60),
+            max_retries=0 # 重试由本类统一处理
+        )
+        self.cache = LLMCache(config)
+        self.budget = TokenBudget(config, storage)
+        self.concurrency = max(1, int(self.config.get('concurrency', 4)))
+        self._pool = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="llm")
+            return self._pool
+
+    def _model_buckets(self, model):
+        """模型的 (每分钟请求数, 每分钟 token 数) 令牌桶，未配置的限制为 None"""
+        with self._lock:
+            if model not in self._buckets:
+                limit = self.limits.get(model) or self.limits.get('default') or {}
+                rpm, tpm = limit.get('rpm'), limit.get('tpm')
+                self._buckets[model] = (
+                    TokenBucket(rpm / 60, rpm) if rpm else None,
+                    TokenBucket(tpm / 60, tpm) if tpm else None,
+                )
+            return self._buckets[model]
+
+    def _acquire(self, model, estimated_tokens):
+        rpm_bucket, tpm_bucket = self._model_buckets(model)
+        wait = max(
+            rpm_bucket.reserve() if rpm_bucket else 0.0,
+            tpm_bucket.reserve(estimated_tokens) if tpm_bucket else 0.0,
+        )
+        if wait > 0:
+            logger.debug(f"{model} 达到速率上限，等待 {wait:.1f} 秒")
+            time.sleep(wait)
+
+    def _request(self, task, model, prompt_estimate, max_output, send):
+        """带限速与重试的实际调用 (send 发出一次请求并返回响应)"""
+        # 按输入估算加输出上限预扣，调用后按实际用量补扣
+        estimated = prompt_estimate + max_output
+        for attempt in range(self.max_retries + 1):
+            self._acquire(model, estimated)
+            start = time.perf_counter()
+            try:
+                response = send()
+            except Exception as e:
+                metrics.record_llm(model, task, time.perf_counter() - start, error=True)
+                retryable = isinstance(e, APIConnectionError) or (
+                    isinstance(e, APIStatusError) and e.status_code in RETRYABLE_STATUS
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                delay = max(delay, min(self.backoff_max, _retry_after(e) or 0))
+                logger.warning(f"LLM 调用失败 ({model}): {e}，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+                if getattr(e, 'status_code', None) == 429:
+                    # 限流时同一模型的其他请求一起暂停
+                    rpm_bucket, _ = self._model_buckets(model)
+                    if rpm_bucket:
+                        rpm_bucket.pause(delay)
+                time.sleep(delay)
+                continue
+
+            usage = getattr(response, 'usage', None)
+            metrics.record_llm(model, task, time.perf_counter() - start, usage)
+            prompt_tokens = getattr(usage, 'prompt_tokens', None) if usage is not None else None
+            completion_tokens = getattr(usage, 'completion_tokens', None) if usage is not None else None
+            if prompt_tokens is None:
+                # 服务端未返回用量时按估算计入预算
+                prompt_tokens = prompt_estimate
+                choices = getattr(response, 'choices', None)
+                completion_tokens = estimate_tokens(choices[0].message.content or "") if choices else 0
+            self.budget.record(model, task, prompt_tokens, completion_tokens or 0)
+            _, tpm_bucket = self._model_buckets(model)
+            actual = prompt_tokens + (completion_tokens or 0)
+            if tpm_bucket and actual > estimated:
+                tpm_bucket.reserve(actual - estimated)
+            return response
+
+    def _check_budget(self, model, task):
+        if self.budget.state == 'exhausted':
+            metrics.incr('llm_budget_rejected', model=model, task=task)
+            raise BudgetExceeded(f"LLM token 预算已用完 ({self.budget.summary()})")
+
+    @staticmethod
+    def _valid(validate, content):
+        """validate 抛出异常或返回 False 即为不合格回复"""
+        if validate is None:
+            return True
+        try:
+            return validate(content) is not False
+        except Exception:
+            return False
+
+    def chat(self, task, model, messages, prompt_version=None, use_cache=True, validate=None, **params):
+        """
+        调用 chat.completions 并返回回复文本
+        task 用于指标分组；prompt_version 随提示词修改递增，使旧缓存失效
+        validate 为调用方的解析/校验函数：只缓存通过校验的回复，命中的旧缓存未通过校验时重新调用
+        """
+        key = LLMCache.make_key(model, messages, params, prompt_version)
+        if use_cache:
+            cached = self.cache.get(key, model, task)
+            if cached is not None and self._valid(validate, cached):
+                return cached
+
+        self._check_budget(model, task)
+        response = self._request(
+            task, model,
+            sum(estimate_tokens(m['content']) for m in messages), params.get('max_tokens', 0),
+            lambda: self.client.chat.completions.create(model=model, messages=messages, **params)
+        )
+        content = response.choices[0].message.content or ""
+        if use_cache and content and self._valid(validate, content):
+            self.cache.put(key, model, task, prompt_version, content)
+        return content
+
+    def embed(self, task, model, texts):
+        """调用 embeddings 接口，返回与 texts 顺序一致的向量列表 (不缓存，结果由向量索引持久化)"""
+        self._check_budget(model, task)
+        response = self._request(
+            task, model, sum(estimate_tokens(text) for text in texts), 0,
+            lambda: self.client.embeddings.create(model=model, input=list(texts))
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
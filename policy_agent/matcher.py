@@ -0,0 +1,68 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多模式匹配：由包含词和排除词一次性构建自动机，
+    单次扫描文本即可得到全部命中的词，耗时与关键词数量无关
+    """
+
+    def __init__(self, keywords=None, exclude_keywords=None):
+        self.keywords = [kw for kw in (keywords or []) if kw]
+        self.exclude_keywords = [kw for kw in (exclude_keywords or []) if kw]
+        # 节点以数组存储：goto[i] 为字符 -> 子节点，fail[i] 为失配指针，output[i] 为 (词, 是否排除词)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for kw in self.keywords:
+            self._add(kw, False)
+        for kw in self.exclude_keywords:
+            self._add(kw, True)
+        self._build()
+
+    def _add(self, word, excluded):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        if (word, excluded) not in self._output[node]:
+            self._output[node].append((word, excluded))
+
+    def _build(self):
+        # 广度优先计算失配指针，第一层节点的失配指针指向根
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # 合并失配链上的输出，匹配时无需再沿 fail 指针回溯
+                self._output[child] = self._output[child] + [
+                    out for out in self._output[self._fail[child]] if out not in self._output[child]
+                ]
+
+    def find(self, text):
+        """返回 (命中的包含词列表, 命中的排除词列表)，按配置顺序去重"""
+        if not text:
+            return [], []
+        found = set()
+        node = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+        included = [kw for kw in self.keywords if (kw, False) in found]
+        excluded = [kw for kw in self.exclude_keywords if (kw, True) in found]
+        return included, excluded
@@ -0,0 +1,169 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from .utils import logger
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    """
+    单次运行的指标：计时 (次数 + 耗时) 与计数，按标签区分
+    爬虫、LLM、数据库、推送共用一个实例 (模块级 metrics)，任务结束时导出 JSON 报告与 Prometheus 文本
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._timers = {}
+            self._counters = {}
+            self._sections = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def incr(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total = self._timers.get(key, (0, 0.0))
+            self._timers[key] = (count + 1, total + seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """计时上下文：with metrics.timer('fetch', source=...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """计时装饰器，未指定 op 时以函数名作为 op 标签"""
+        def decorator(func):
+            op_labels = labels or {"op": func.__name__}
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **op_labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, section, values):
+        """附加一段运行信息 (如 token 预算)，原样写入 JSON 报告，数值项同时输出为 Prometheus 指标"""
+        with self._lock:
+            self._sections[section] = dict(values)
+
+    def record_llm(self, model, task, seconds, usage=None, error=False):
+        """记录一次 LLM 调用：耗时、token 用量 (response.usage)、失败次数"""
+        self.observe('llm', seconds, model=model, task=task)
+        if error:
+            self.incr('llm_errors', model=model, task=task)
+        if usage is not None:
+            self.incr('llm_tokens', getattr(usage, 'prompt_tokens', 0) or 0, model=model, kind='prompt')
+            self.incr('llm_tokens', getattr(usage, 'completion_tokens', 0) or 0, model=model, kind='completion')
+
+    def report(self):
+        """汇总为 JSON 报告：按来源、按模型、其余按阶段"""
+        with self._lock:
+            timers = dict(self._timers)
+            counters = dict(self._counters)
+            sections = dict(self._sections)
+        finished_at = time.time()
+        sources, llm, stages = {}, {}, {}
+
+        def bucket(labels):
+            labels = dict(labels)
+            if 'source' in labels:
+                return sources.setdefault(labels.pop('source'), {}), labels
+            if 'model' in labels:
+                return llm.setdefault(labels.pop('model'), {}), labels
+            return stages, labels
+
+        for (name, labels), (count, total) in timers.items():
+            target, rest = bucket(labels)
+            prefix = "_".join([name] + [v for _, v in sorted(rest.items())])
+            target[f"{prefix}_count"] = target.get(f"{prefix}_count", 0) + count
+            target[f"{prefix}_seconds"] = round(target.get(f"{prefix}_seconds", 0) + total, 3)
+        for (name, labels), value in counters.items():
+            target, rest = bucket(labels)
+            key = "_".join([name] + [v for _, v in sorted(rest.items())])
+            target[key] = target.get(key, 0) + value
+
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "finished_at": datetime.fromtimestamp(finished_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_seconds": round(finished_at - self.started_at, 3),
+            "sources": sources,
+            "llm": llm,
+            "stages": stages,
+            **sections,
+        }
+
+    def prometheus(self):
+        """Prometheus 文本格式 (node_exporter textfile collector)"""
+        def fmt_labels(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+        with self._lock:
+            timers = sorted(self._timers.items())
+            counters = sorted(self._counters.items())
+            sections = sorted(self._sections.items())
+        lines = []
+        for (name, labels), (count, total) in timers:
+            lines.append(f"policy_agent_{name}_seconds_total{fmt_labels(labels)} {total:.6f}")
+            lines.append(f"policy_agent_{name}_count{fmt_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            lines.append(f"policy_agent_{name}_total{fmt_labels(labels)} {value}")
+        for section, values in sections:
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"policy_agent_{section}_{key} {value}")
+        lines.append(f"policy_agent_run_duration_seconds {time.time() - self.started_at:.3f}")
+        lines.append(f"policy_agent_run_timestamp_seconds {int(time.time())}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, config):
+        """按 config.yaml 的 metrics 段写出运行报告与 Prometheus 文本 (原子替换)"""
+        conf = config.get('metrics', {})
+        if not conf.get('enabled', True):
+            return
+        outputs = (
+            (conf.get('report', 'reports/run_report.json'),
+             lambda: json.dumps(self.report(), ensure_ascii=False, indent=2)),
+            (conf.get('textfile', 'reports/policy_agent.prom'), self.prometheus),
+        )
+        for path, render in outputs:
+            if not path:
+                continue
+            try:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(render())
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"写出运行指标失败 {path}: {e}")
+        logger.info(f"运行指标已写出: {conf.get('report', 'reports/run_report.json')}")
+
+
+metrics = RunMetrics()
@@ -1,11 +1,14 @@
 import requests
-import time
 from datetime import datetime
+from .metrics import metrics
+from .throttle import RateLimiter
 from .utils import logger
 
 class Notifier:
     def __init__(self, config):
         self.config = config.get('notification', {})
+        # 与爬虫共用按域名限速配置，防止触发机器人频率限制
+        self.limiter = RateLimiter(config.get('crawler', {}).get('rate_limit', {}))
         
     def _format_markdown(self, policies):
         """将政策列表格式化为 Markdown"""
@@ -61,10 +64,12 @@ class Notifier:
                     "content": content,
                     "template": "html"
                 }
-                resp = requests.post(url, json=data)
+                with metrics.timer('notify', channel='pushplus'):
+                    resp = requests.post(url, json=data)
                 logger.info(f"PushPlus 推送结果: {resp.text}")
             except Exception as e:
                 logger.error(f"PushPlus 推送失败: {e}")
+                metrics.incr('notify_errors', channel='pushplus')
 
         # 2. Webhook 推送 (企业微信/钉钉/飞书)
         wh_conf = self.config.get('webhook', {})
@@ -97,8 +102,11 @@ class Notifier:
                             }
                         }
 
-                    resp = requests.post(webhook_url, json=payload)
+                    self.limiter.acquire(webhook_url)
+                    with metrics.timer('notify', channel='webhook'):
+                        resp = requests.post(webhook_url, json=payload)
+                    self.limiter.report(webhook_url, resp.status_code, resp.headers.get('Retry-After'))
                     logger.info(f"Webhook (批次 {i//batch_size + 1}) 推送结果: {resp.text}")
-                    time.sleep(1) # 增加间隔防止触发频率限制
                 except Exception as e:
                     logger.error(f"Webhook 推送失败: {e}")
+                    metrics.incr('notify_errors', channel='webhook')
@@ -0,0 +1,151 @@
+import asyncio
+from .metrics import metrics
+from .utils import logger
+
+# 队列结束标记
+_DONE = object()
+
+
+class PolicyPipeline:
+    """
+    流水线执行一次任务：抓取+筛选 -> 摘要 -> 入库 (+向量索引) -> 推送
+    各阶段之间是有界队列，摘要与入库和剩余来源的抓取同时进行；下游处理不过来时上游在 put 处等待
+    政策入库后即丢弃正文，内存占用不随来源数量增长
+    """
+
+    def __init__(self, config, crawler, summarizer, storage, notifier, index=None):
+        self.config = config.get('pipeline', {})
+        self.crawler = crawler
+        self.summarizer = summarizer
+        self.storage = storage
+        self.notifier = notifier
+        self.index = index # 向量索引，新政策入库后增量追加
+        self.inserted = 0
+        self.queue_size = max(1, int(self.config.get('queue_size', 8)))
+        self.summary_workers = max(1, int(self.config.get('summary_workers', 4)))
+        self.frontier_max_attempts = max(1, int(self.config.get('frontier_max_attempts', 3)))
+        self.frontier_max_age_days = self.config.get('frontier_max_age_days', 7)
+
+    async def _crawl(self, resume, out):
+        """抓取阶段：筛选通过的政策逐条放入摘要队列"""
+        try:
+            with metrics.timer('stage', stage='crawl'):
+                await self.crawler.run_async(resume=resume, sink=out)
+        finally:
+            for _ in range(self.summary_workers):
+                await out.put(_DONE)
+
+    async def _summarize(self, inbox, out):
+        """摘要阶段 (多个 worker)：已有摘要的 (续跑恢复) 直接下传"""
+        while True:
+            p = await inbox.get()
+            if p is _DONE:
+                await out.put(_DONE)
+                return
+            try:
+                if 'summary' not in p:
+                    with metrics.timer('stage', stage='summarize'):
+                        p['summary'] = await asyncio.get_running_loop().run_in_executor(
+                            getattr(self.summarizer, 'pool', None), self.summarizer.generate_summary, p['content']
+                        )
+                    await asyncio.to_thread(self.storage.frontier_update, p['url'], 'summarized', summary=p['summary'])
+                await out.put(p)
+            except Exception as e:
+                # 留在 frontier 的 filtered 阶段，--resume 时重新生成
+                logger.error(f"生成摘要失败 {p['url']}: {e}")
+                self.crawler.mark_failed(p['source_name'])
+
+    async def _save(self, inbox, saved):
+        """入库阶段：队列中已就绪的政策合并为一个事务批量写入，保存后丢弃正文，只保留推送所需字段"""
+        remaining = self.summary_workers
+        while remaining:
+            batch = []
+            p = await inbox.get()
+            while True:
+                if p is _DONE:
+                    remaining -= 1
+                else:
+                    batch.append(p)
+                if inbox.empty():
+                    break
+                p = inbox.get_nowait()
+            if not batch:
+                continue
+            try:
+                with metrics.timer('stage', stage='save'):
+                    new, skipped = await asyncio.to_thread(self.storage.save_policies, batch)
+                self.inserted += len(new)
+                # 已在库中的 (如上次运行入库后、记录 saved 前中断) 同样推进到 saved 并推送，否则会一直停留在 summarized
+                for p in new + skipped:
+                    await asyncio.to_thread(self.storage.frontier_update, p['url'], 'saved')
+                    p.pop('content', None)
+                    saved.append(p)
+                if new and self.index is not None:
+                    with metrics.timer('stage', stage='index'):
+                        await asyncio.to_thread(self.index.sync, self.storage)
+            except Exception as e:
+                logger.error(f"保存政策失败 ({len(batch)} 条): {e}")
+                for p in batch:
+                    self.crawler.mark_failed(p['source_name'])
+
+    async def run_async(self, resume=False, summarized=(), saved=()):
+        """
+        summarized/saved 为续跑时从 frontier 恢复的政策：前者直接进入入库阶段，后者只需推送
+        返回本次推送的政策列表
+        """
+        to_summarize = asyncio.Queue(maxsize=self.queue_size)
+        to_save = asyncio.Queue(maxsize=self.queue_size)
+        processed = list(saved)
+
+        async def feed_summarized():
+            for p in summarized:
+                await to_summarize.put(p)
+            await self._crawl(resume, to_summarize)
+
+        tasks = [
+            asyncio.create_task(feed_summarized()),
+            *(asyncio.create_task(self._summarize(to_summarize, to_save)) for _ in range(self.summary_workers)),
+            asyncio.create_task(self._save(to_save, processed)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # 任一阶段异常时取消其余阶段，等待其清理 (如关闭浏览器) 后再抛出
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        logger.info(f"本次运行共入库 {self.inserted} 条新政策")
+
+        # 新政策入库后再记录列表页指纹，下次运行跳过无变化的来源
+        self.crawler.commit_source_states()
+
+        client = getattr(self.summarizer, 'client', None)
+        if client is not None:
+            budget = client.budget.summary()
+            metrics.annotate('llm_budget', budget)
+            logger.info(
+                f"LLM token 用量：本次 {budget['run_used']} / {budget['run_limit'] or '不限'}，"
+                f"今日 {budget['day_used']} / {budget['day_limit'] or '不限'} ({budget['state']})"
+            )
+
+        # 推送为每日汇总，所有政策入库后发送一次；按来源顺序排列
+        order = {source['name']: i for i, source in enumerate(self.crawler.sources)}
+        processed.sort(key=lambda p: order.get(p['source_name'], len(order)))
+        with metrics.timer('stage', stage='notify'):
+            await asyncio.to_thread(self.notifier.send, processed)
+        for p in processed:
+            self.storage.frontier_update(p['url'], 'notified')
+        logger.info("推送流程已执行")
+
+        # 已完成的记录不再留在 frontier；始终无法完成的 (如详情页失效) 重试若干次后放弃，
+        # 避免之后每次运行都带 --resume 且 frontier 无限增长
+        abandoned = self.storage.finish_frontier(self.frontier_max_attempts, self.frontier_max_age_days)
+        for row in abandoned:
+            logger.warning(f"多次运行仍未完成，放弃续跑 ({row['stage']}): {row['title']} {row['url']}")
+        if abandoned:
+            metrics.incr('frontier_abandoned', len(abandoned))
+        return processed
+
+    def run(self, resume=False, summarized=(), saved=()):
+        return asyncio.run(self.run_async(resume, summarized, saved))
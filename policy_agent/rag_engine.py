@@ -1,7 +1,12 @@
-import sqlite3
 import pandas as pd
-from openai import OpenAI
 import numpy as np
+from .llm import LLMClient
+from .search import hybrid_rank
+from .storage import Storage
+from .vector_index import VectorIndex, make_embedder
+
+# Bump when the system prompt changes so cached answers are not reused
+PROMPT_VERSION = "1"
 
 class RAGEngine:
     def __init__(self, config, db_path="policy_data.db"):
@@ -10,30 +15,28 @@ class RAGEngine:
         self.api_key = config['summary'].get('api_key')
         self.base_url = config['summary'].get('base_url')
         self.model = config['summary'].get('model')
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        # One storage handle for retrieval and LLM usage accounting; released by close()
+        self.storage = Storage(db_path)
+        # Cached client: repeated questions over the same retrieved context are answered from cache
+        self.client = LLMClient(config, self.storage)
+        self.embedder = make_embedder(config, self.client)
+        self.vector_weight = config.get('vector_index', {}).get('hybrid_weight', 0.5)
 
     def search_policies(self, query, limit=10):
-        """Simple keyword search in DB"""
-        conn = sqlite3.connect(self.db_path)
-        # Using simple LIKE for now. For better RAG, vector embeddings are needed.
-        # Given "Database file as knowledge base", we act as an interface to query SQL and then summarize.
-        
-        # Split query into keywords
-        keywords = query.split()
-        conditions = []
-        params = []
-        for kw in keywords:
-            conditions.append("(title LIKE ? OR summary LIKE ?)")
-            params.extend([f"%{kw}%", f"%{kw}%"])
-        
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        sql = f"SELECT title, summary, publish_date, source_name, url FROM policies WHERE {where_clause} ORDER BY publish_date DESC LIMIT ?"
-        params.append(limit)
-        
-        df = pd.read_sql_query(sql, conn, params=params)
-        conn.close()
-        return df
+        """Hybrid retrieval: BM25 full-text hits (FTS5) blended with vector similarity hits"""
+        # "any" mode: question words are dropped and policies matching more / rarer bigrams rank first,
+        # so unsegmented Chinese questions work without a word segmenter
+        keyword_hits = [(row['id'], row['score']) for row in self.storage.search(query, limit=limit * 3, mode='any')]
+        # Reopened per query so policies indexed by a running crawl are visible
+        vector_hits = VectorIndex(self.config, self.embedder).search(query, k=limit * 3)
+        ranked = hybrid_rank(keyword_hits, vector_hits, self.vector_weight, limit)
+        policies = self.storage.get_policies([pid for pid, _ in ranked])
+        rows = [dict(policies[pid], score=score) for pid, score in ranked if pid in policies]
+        return pd.DataFrame(rows, columns=['title', 'summary', 'publish_date', 'source_name', 'url', 'score'])
+
+    def close(self):
+        """Close the database connections opened by this engine"""
+        self.storage.close()
 
     def chat(self, user_query):
         """Chat with policy data"""
@@ -64,12 +67,11 @@ User Question: {user_query}
 """
         
         # 3. Call LLM
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return self.client.chat(
+            'rag', self.model,
+            prompt_version=PROMPT_VERSION,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ]
         )
-        
-        return response.choices[0].message.content
@@ -0,0 +1,90 @@
+import re
+
+# 中文不依赖分词器：连续汉字切成重叠的二元组 (如 数据要素 -> 数据 据要 要素)，片段末字另作单字词，
+# 保证任意单字都能以前缀查询命中；字母、数字分别按词切分 (300EFLOPS -> 300 eflops)。结果以空格连接后交给 FTS5 的 unicode61 分词
+_CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9]+|[A-Za-z]+')
+_CJK_CHAR_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+# 自然语言提问中的疑问词/虚词，检索前去掉，避免罕见的 "哪些" 等二元组主导排序
+QUERY_STOPWORDS = (
+    "有哪些", "哪些", "什么", "怎么", "如何", "是否", "请问", "关于", "相关", "介绍", "一下",
+    "的", "了", "吗", "呢", "吧",
+)
+
+
+def cjk_tokens(text, trailing=True):
+    """切分为检索词：汉字二元组 (trailing=True 时片段末字单独成词) + 小写字母词 / 数字"""
+    tokens = []
+    for run in _CJK_RUN_RE.findall(text or ""):
+        if not _CJK_CHAR_RE.match(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if trailing:
+                tokens.append(run[-1])
+    return tokens
+
+
+def fts_text(text):
+    """写入全文索引的文本 (注册为 SQLite 函数 fts_tokens，由触发器调用)"""
+    return " ".join(cjk_tokens(text))
+
+
+def match_query(query, mode='all'):
+    """
+    构造 FTS5 MATCH 表达式，无可检索词时返回 None
+    - all: 空格分隔的每个词都须出现 (词内二元组按短语相邻匹配，等价于子串包含)，用于看板关键词搜索
+    - any: 去掉疑问词后任一二元组出现即可，由 BM25 按命中多少与稀有程度排序，用于自然语言提问
+    """
+    if mode == 'any':
+        for word in QUERY_STOPWORDS:
+            query = query.replace(word, " ")
+        tokens = list(dict.fromkeys(cjk_tokens(query, trailing=False)))
+        return " OR ".join(f'"{token}"' for token in tokens) or None
+
+    phrases = []
+    for term in query.split():
+        tokens, prefix = _term_tokens(term)
+        if not tokens:
+            continue
+        phrases.append('"' + " ".join(tokens) + '"' + (" *" if prefix else ""))
+    return " AND ".join(phrases) or None
+
+
+def _term_tokens(term):
+    """
+    "all" 模式下单个检索词的短语词序列，返回 (词列表, 末词是否按前缀匹配)
+    后面紧跟字母/数字的汉字片段在正文中同样在此处结束，与索引一致地带上片段末字，保证短语相邻；
+    最后一个汉字片段不带末字 (正文中可能继续)，只有一个字时该字按前缀匹配以该字开头的二元组或片段末字
+    (如 2025年 -> "2025 年" *，第3批 -> "第 3 批" *)
+    """
+    runs = _CJK_RUN_RE.findall(term)
+    tokens, prefix = [], False
+    for i, run in enumerate(runs):
+        if not _CJK_CHAR_RE.match(run):
+            tokens.append(run.lower())
+            prefix = False
+            continue
+        last = i == len(runs) - 1
+        tokens.extend(cjk_tokens(run, trailing=not last))
+        prefix = last and len(run) == 1
+    return tokens, prefix
+
+
+def hybrid_rank(keyword_hits, vector_hits, vector_weight=0.5, limit=10):
+    """
+    混合排序：keyword_hits (BM25) 与 vector_hits (余弦相似度) 均为 [(政策 id, 分数)]
+    两路分数各自除以本路最高分归一到 [0, 1] 后按 vector_weight 加权求和，返回前 limit 条 [(id, 分数)]
+    """
+    def normalized(hits):
+        top = max((score for _, score in hits), default=0.0)
+        return {pid: max(score, 0.0) / top for pid, score in hits} if top > 0 else {}
+
+    keyword, vector = normalized(keyword_hits), normalized(vector_hits)
+    scores = {
+        pid: (1 - vector_weight) * keyword.get(pid, 0.0) + vector_weight * vector.get(pid, 0.0)
+        for pid in keyword.keys() | vector.keys()
+    }
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
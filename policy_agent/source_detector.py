@@ -1,14 +1,18 @@
 import json
 import logging
 import asyncio
-from openai import OpenAI
 from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright
+from .browser import block_resources
+from .llm import LLMClient
 # try import from crawler, but source_detector should be independent or share utils
 # Let's keep it simple and independent or reuse some logic if needed.
 
 logger = logging.getLogger(__name__)
 
+# Bump when the selector prompt changes so cached responses are not reused
+PROMPT_VERSION = "1"
+
 class SourceDetector:
     def __init__(self, config):
         self.config = config
@@ -20,13 +24,16 @@ class SourceDetector:
              # Fallback or error, but let's assume UI handles checking
              pass
         
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        # Cached client: re-analyzing an unchanged page does not call the LLM again
+        self.client = LLMClient(config)
 
     async def _fetch_page(self, url):
         """Fetch page content using Playwright"""
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
+            # Only the DOM is needed: skip images, fonts, stylesheets and trackers
+            await block_resources(page)
             try:
                 await page.goto(url, timeout=30000)
                 await page.wait_for_load_state("networkidle")
@@ -98,15 +105,16 @@ HTML Snippet:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            content = self.client.chat(
+                'detect_source', self.model,
+                prompt_version=PROMPT_VERSION,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that outputs JSON only."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                validate=json.loads
             )
-            content = response.choices[0].message.content
             logger.info(f"LLM Response: {content}")
             result = json.loads(content)
             return result, None
@@ -1,14 +1,65 @@
 import sqlite3
+import json
 import os
-from .utils import logger
+import threading
+from .metrics import metrics
+from .search import fts_text, match_query
+from .utils import logger, normalize_date
+
+# 抓取任务各阶段 (frontier.stage)，每完成一个阶段即提交，中断后可从最后提交的阶段继续
+FRONTIER_STAGES = ('discovered', 'fetched', 'filtered', 'summarized', 'saved', 'notified')
+POLICY_COLUMNS = "title, source_name, publish_date, publish_date_raw, url, summary, keywords, key_metrics, deadlines, content"
+# 全文检索的列权重 (标题 / 摘要 / 正文)，用于 bm25() 排序
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+FRONTIER_FIELDS = ('publish_date', 'content', 'is_relevant', 'keywords', 'summary', 'key_metrics', 'deadlines')
+
+# 每个连接打开时设置：WAL 下读写互不阻塞 (看板读取不会卡住抓取写入)，NORMAL 只在检查点时 fsync
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000", # 约 16MB 页缓存
+    "PRAGMA temp_store = MEMORY",
+)
+
+def _json_field(value):
+    """列表类字段 (key_metrics/deadlines) 以 JSON 文本存储"""
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value), ensure_ascii=False)
+    return value
 
 class Storage:
     def __init__(self, db_path="policy_data.db"):
         self.db_path = db_path
+        # 每个线程一个长连接 (asyncio.to_thread 的工作线程会复用)，避免每次查询重新打开数据库
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
         self._init_db()
 
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # 全文索引的触发器调用此函数切分中文 (写入 policies 的连接都必须注册)
+            conn.create_function('fts_tokens', 1, fts_text, deterministic=True)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._conn()
         c = conn.cursor()
         # 创建政策表
         c.execute('''
@@ -16,46 +67,510 @@ class Storage:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT,
                 source_name TEXT,
-                publish_date TEXT,
+                publish_date TEXT, -- ISO 格式 YYYY-MM-DD，无法解析时为 NULL
+                publish_date_raw TEXT, -- 网页上显示的原始日期文本
                 url TEXT UNIQUE,
                 summary TEXT,
+                keywords TEXT,
+                key_metrics TEXT, -- JSON 数组：核心量化指标 (合并模式生成)
+                deadlines TEXT, -- JSON 数组：关键截止时间 (合并模式生成)
+                content TEXT, -- 正文，用于全文检索
                 crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        self._add_column_if_missing(c, 'policies', 'keywords', 'TEXT')
+        self._add_column_if_missing(c, 'policies', 'key_metrics', 'TEXT')
+        self._add_column_if_missing(c, 'policies', 'deadlines', 'TEXT')
+        self._add_column_if_missing(c, 'policies', 'content', 'TEXT')
+        if self._add_column_if_missing(c, 'policies', 'publish_date_raw', 'TEXT'):
+            self._normalize_existing_dates(c)
+        # 按日期倒序 / 按来源+日期查询走索引
+        c.execute("CREATE INDEX IF NOT EXISTS idx_policies_publish_date ON policies (publish_date)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_policies_source_date ON policies (source_name, publish_date)")
+        # 列表页状态表：用于判断来源自上次运行后是否有更新
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS source_state (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                watermark TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._add_column_if_missing(c, 'source_state', 'watermark', 'TEXT')
+        # 抓取任务表：记录本次任务中每个候选政策所处阶段，用于崩溃后 --resume 续跑
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                source_name TEXT,
+                title TEXT,
+                publish_date TEXT,
+                publish_date_raw TEXT,
+                content TEXT,
+                is_relevant INTEGER,
+                keywords TEXT,
+                summary TEXT,
+                key_metrics TEXT,
+                deadlines TEXT,
+                publisher TEXT,
+                attempts INTEGER DEFAULT 0, -- 已结束但仍未完成的运行次数
+                stage TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._add_column_if_missing(c, 'frontier', 'key_metrics', 'TEXT')
+        self._add_column_if_missing(c, 'frontier', 'deadlines', 'TEXT')
+        self._add_column_if_missing(c, 'frontier', 'publisher', 'TEXT')
+        self._add_column_if_missing(c, 'frontier', 'attempts', 'INTEGER DEFAULT 0')
+        # 筛选结论表：记录每个候选的判定 (含关键词/LLM 判为不相关的)，避免次日重复抓取、重复调用 LLM
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS verdicts (
+                url TEXT PRIMARY KEY,
+                title_hash TEXT,
+                content_hash TEXT,
+                verdict INTEGER, -- 1 相关 / 0 不相关
+                reason TEXT, -- keyword: 关键词/排除词 / llm: LLM 判定
+                model TEXT,
+                prompt_version TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # LLM 用量表：按 日期/模型/任务 累计，用于每日 token 预算
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                day TEXT,
+                model TEXT,
+                task TEXT,
+                calls INTEGER DEFAULT 0,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                PRIMARY KEY (day, model, task)
+            )
+        ''')
+        self._init_fts(c)
         conn.commit()
-        conn.close()
 
+    def _init_fts(self, cursor):
+        """
+        标题/摘要/正文的 FTS5 全文索引 (无内容表，只存倒排索引)，由触发器与 policies 保持同步
+        写入的是 fts_tokens() 切分后的文本；旧数据库首次建表时从 policies 重建
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'policies_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS policies_fts
+            USING fts5(title, summary, content, content='', tokenize='unicode61')
+        ''')
+        insert = '''
+            INSERT INTO policies_fts (rowid, title, summary, content)
+            VALUES (new.id, fts_tokens(new.title), fts_tokens(new.summary), fts_tokens(new.content));
+        '''
+        delete = '''
+            INSERT INTO policies_fts (policies_fts, rowid, title, summary, content)
+            VALUES ('delete', old.id, fts_tokens(old.title), fts_tokens(old.summary), fts_tokens(old.content));
+        '''
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS policies_fts_ai AFTER INSERT ON policies BEGIN {insert} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS policies_fts_ad AFTER DELETE ON policies BEGIN {delete} END")
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS policies_fts_au AFTER UPDATE OF title, summary, content ON policies "
+            f"BEGIN {delete} {insert} END"
+        )
+        if not exists:
+            # 默认排序 (rank 列) 使用加权 BM25
+            weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+            cursor.execute(f"INSERT INTO policies_fts (policies_fts, rank) VALUES ('rank', 'bm25({weights})')")
+            cursor.execute('''
+                INSERT INTO policies_fts (rowid, title, summary, content)
+                SELECT id, fts_tokens(title), fts_tokens(summary), fts_tokens(content) FROM policies
+            ''')
+            if cursor.rowcount > 0:
+                logger.info(f"已为 {cursor.rowcount} 条政策建立全文索引")
+
+    def _add_column_if_missing(self, cursor, table, column, decl):
+        """旧版本数据库升级：补充新增的列，返回是否新增"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            return True
+        return False
+
+    def _normalize_existing_dates(self, cursor):
+        """旧数据升级：原始日期文本移入 publish_date_raw，publish_date 改为 ISO 日期"""
+        cursor.execute("SELECT id, publish_date, url FROM policies")
+        rows = cursor.fetchall()
+        cursor.executemany(
+            "UPDATE policies SET publish_date_raw = ?, publish_date = ? WHERE id = ?",
+            [(raw, normalize_date(raw, url), pid) for pid, raw, url in rows]
+        )
+        logger.info(f"已将 {len(rows)} 条政策的发布日期转换为 ISO 格式")
+
+    @metrics.timed('db')
     def is_processed(self, url):
         """检查URL是否已经爬取过"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._conn()
         c = conn.cursor()
         c.execute("SELECT id FROM policies WHERE url = ?", (url,))
         result = c.fetchone()
-        conn.close()
         return result is not None
 
+    @metrics.timed('db')
+    def filter_processed(self, urls):
+        """批量去重：一次查询返回 urls 中已经爬取过的 URL 集合"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return set()
+        processed = set()
+        conn = self._conn()
+        c = conn.cursor()
+        # 分批查询，避免超过 SQLite 参数个数上限
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i+500]
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"SELECT url FROM policies WHERE url IN ({placeholders})", chunk)
+            processed.update(row[0] for row in c.fetchall())
+        return processed
+
+    @metrics.timed('db')
+    def load_processed_urls(self):
+        """加载全部已爬取 URL，用于抓取开始时预热内存去重集合"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("SELECT url FROM policies")
+        urls = {row[0] for row in c.fetchall()}
+        return urls
+
+    @metrics.timed('db')
+    def get_source_state(self, url):
+        """获取列表页上次的指纹、HTTP 缓存校验头与首页 URL 水位，不存在返回 None"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("SELECT fingerprint, etag, last_modified, watermark FROM source_state WHERE url = ?", (url,))
+        row = c.fetchone()
+        if not row:
+            return None
+        state = dict(row)
+        state['watermark'] = json.loads(state['watermark']) if state['watermark'] else []
+        return state
+
+    @metrics.timed('db')
+    def save_source_state(self, url, fingerprint, etag=None, last_modified=None, watermark=None):
+        """记录列表页指纹、HTTP 缓存校验头与首页 URL 水位"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute('''
+            INSERT OR REPLACE INTO source_state (url, fingerprint, etag, last_modified, watermark, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (url, fingerprint, etag, last_modified, json.dumps(watermark or [], ensure_ascii=False)))
+        conn.commit()
+
+    @metrics.timed('db')
+    def frontier_add(self, source_name, entries):
+        """登记新发现的候选政策 (阶段 discovered)，已登记的保持原阶段"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.executemany('''
+            INSERT OR IGNORE INTO frontier (url, source_name, title, publish_date, publish_date_raw, stage)
+            VALUES (?, ?, ?, ?, ?, 'discovered')
+        ''', [
+            (e['url'], source_name, e['title'], e.get('publish_date'), e.get('publish_date_raw'))
+            for e in entries
+        ])
+        conn.commit()
+
+    @metrics.timed('db')
+    def frontier_update(self, url, stage, **fields):
+        """推进候选政策到 stage 阶段，并保存该阶段的产出 (正文/筛选结果/摘要等)"""
+        if stage not in FRONTIER_STAGES:
+            raise ValueError(f"未知阶段: {stage}")
+        columns = [name for name in fields if name in FRONTIER_FIELDS]
+        assignments = "".join(f", {name} = ?" for name in columns)
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute(
+            f"UPDATE frontier SET stage = ?, updated_at = CURRENT_TIMESTAMP{assignments} WHERE url = ?",
+            [stage] + [_json_field(fields[name]) for name in columns] + [url]
+        )
+        conn.commit()
+
+    @metrics.timed('db')
+    def frontier_pending(self):
+        """未完成的候选政策 (排除已推送和已判定不相关的)"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute('''
+            SELECT * FROM frontier
+            WHERE stage != 'notified' AND NOT (stage = 'filtered' AND is_relevant = 0)
+        ''')
+        rows = [dict(row) for row in c.fetchall()]
+        return rows
+
+    @metrics.timed('db')
+    def frontier_urls(self):
+        """本次任务已登记的全部 URL"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("SELECT url FROM frontier")
+        urls = {row[0] for row in c.fetchall()}
+        return urls
+
+    @metrics.timed('db')
+    def finish_frontier(self, max_attempts=3, max_age_days=7):
+        """
+        运行结束时整理 frontier：删除已推送和已判定不相关的记录 (不再保留正文)，
+        其余未完成的记录计一次尝试，尝试满 max_attempts 次或 max_age_days 天无进展的放弃
+        返回放弃的记录 [{url, title, stage}]
+        """
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("DELETE FROM frontier WHERE stage = 'notified' OR (stage = 'filtered' AND is_relevant = 0)")
+        c.execute("UPDATE frontier SET attempts = COALESCE(attempts, 0) + 1")
+        condition = "attempts >= ? OR updated_at < datetime('now', ?)"
+        params = (max_attempts, f"-{int(max_age_days)} days")
+        c.execute(f"SELECT url, title, stage FROM frontier WHERE {condition}", params)
+        abandoned = [dict(row) for row in c.fetchall()]
+        c.execute(f"DELETE FROM frontier WHERE {condition}", params)
+        conn.commit()
+        return abandoned
+
+    @metrics.timed('db')
+    def clear_frontier(self):
+        """开始新任务前清空上次任务的记录"""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("DELETE FROM frontier")
+        conn.commit()
+
+    @metrics.timed('db')
+    def get_verdicts(self, urls):
+        """批量读取筛选结论，返回 {url: 结论}"""
+        urls = list(dict.fromkeys(urls))
+        verdicts = {}
+        if not urls:
+            return verdicts
+        conn = self._conn()
+        c = conn.cursor()
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i+500]
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"SELECT * FROM verdicts WHERE url IN ({placeholders})", chunk)
+            verdicts.update((row['url'], dict(row)) for row in c.fetchall())
+        return verdicts
+
+    @metrics.timed('db')
+    def save_verdicts(self, verdicts):
+        """写入筛选结论 (同一 URL 覆盖旧结论)"""
+        if not verdicts:
+            return
+        conn = self._conn()
+        c = conn.cursor()
+        c.executemany('''
+            INSERT OR REPLACE INTO verdicts
+            (url, title_hash, content_hash, verdict, reason, model, prompt_version, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [
+            (v['url'], v.get('title_hash'), v.get('content_hash'), v['verdict'], v['reason'],
+             v.get('model'), v.get('prompt_version'))
+            for v in verdicts
+        ])
+        conn.commit()
+
+    @metrics.timed('db')
+    def llm_verdicts(self):
+        """LLM 给出的筛选结论 (本地分类器的训练标注)"""
+        conn = self._conn()
+        rows = [dict(row) for row in conn.execute("SELECT url, verdict FROM verdicts WHERE reason = 'llm'")]
+        return rows
+
+    @metrics.timed('db')
+    def llm_usage_total(self, day):
+        """某天已用的 LLM token 总数"""
+        row = self._conn().execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_usage WHERE day = ?", (day,)
+        ).fetchone()
+        return row[0]
+
+    @metrics.timed('db')
+    def record_llm_usage(self, day, model, task, prompt_tokens, completion_tokens):
+        """累计一次 LLM 调用的 token 用量"""
+        conn = self._conn()
+        conn.execute('''
+            INSERT INTO llm_usage (day, model, task, calls, prompt_tokens, completion_tokens)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT (day, model, task) DO UPDATE SET
+                calls = calls + 1,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens
+        ''', (day, model, task, prompt_tokens, completion_tokens))
+        conn.commit()
+
+    @metrics.timed('db')
+    def policy_texts(self, snippet_chars=500):
+        """已入库政策的标题、正文前 snippet_chars 字与摘要 (本地分类器的正样本)"""
+        conn = self._conn()
+        rows = [dict(row) for row in conn.execute(
+            "SELECT url, title, substr(content, 1, ?) AS content, summary FROM policies", (snippet_chars,)
+        )]
+        return rows
+
+    @staticmethod
+    def _policy_row(policy_data):
+        return (
+            policy_data['title'],
+            policy_data['source_name'],
+            normalize_date(policy_data.get('publish_date'), policy_data['url']),
+            policy_data.get('publish_date_raw', policy_data.get('publish_date')),
+            policy_data['url'],
+            policy_data.get('summary', ''),
+            policy_data.get('keywords', ''),
+            _json_field(policy_data.get('key_metrics')),
+            _json_field(policy_data.get('deadlines')),
+            policy_data.get('content')
+        )
+
+    @metrics.timed('db')
     def save_policy(self, policy_data):
         """保存政策数据"""
+        conn = self._conn()
         try:
-            conn = sqlite3.connect(self.db_path)
             c = conn.cursor()
-            c.execute('''
-                INSERT INTO policies (title, source_name, publish_date, url, summary)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                policy_data['title'],
-                policy_data['source_name'],
-                policy_data['publish_date'],
-                policy_data['url'],
-                policy_data.get('summary', '')
-            ))
+            c.execute(f"INSERT INTO policies ({POLICY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._policy_row(policy_data))
             conn.commit()
-            conn.close()
             logger.info(f"已保存政策: {policy_data['title']}")
             return True
         except sqlite3.IntegrityError:
+            conn.rollback()
             logger.warning(f"政策已存在 (URL冲突): {policy_data['title']}")
             return False
         except Exception as e:
+            conn.rollback()
             logger.error(f"保存数据库失败: {e}")
             return False
+
+    @metrics.timed('db')
+    def save_policies(self, policies):
+        """
+        批量保存政策：一个事务内 executemany 写入，批内重复的 URL 只取第一条
+        返回 (实际入库的政策, 库中已存在而跳过的政策)，失败时整批回滚并返回 ([], [])
+        """
+        if not policies:
+            return [], []
+        conn = self._conn()
+        try:
+            existing = self.filter_processed([p['url'] for p in policies])
+            new, skipped, batch_urls = [], [], set()
+            for p in policies:
+                if p['url'] in batch_urls:
+                    continue
+                batch_urls.add(p['url'])
+                (skipped if p['url'] in existing else new).append(p)
+            conn.executemany(
+                f"INSERT INTO policies ({POLICY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._policy_row(p) for p in new]
+            )
+            conn.commit()
+            if new:
+                logger.info(f"已批量保存 {len(new)} 条政策")
+            if skipped:
+                logger.warning(f"{len(skipped)} 条政策已存在 (URL冲突)，跳过写入")
+            return new, skipped
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"批量保存数据库失败: {e}")
+            return [], []
+
+    @metrics.timed('db')
+    def update_policy(self, url, summary, keywords=None, key_metrics=None, deadlines=None, content=None):
+        """重放缓存时更新已入库政策的摘要、关键词、指标/截止时间及正文 (为 None 的字段保持不变)"""
+        try:
+            fields = {
+                "summary": summary, "keywords": keywords, "key_metrics": key_metrics,
+                "deadlines": deadlines, "content": content,
+            }
+            columns = [name for name, value in fields.items() if value is not None]
+            conn = self._conn()
+            c = conn.cursor()
+            c.execute(
+                f"UPDATE policies SET {', '.join(f'{name} = ?' for name in columns)} WHERE url = ?",
+                [_json_field(fields[name]) for name in columns] + [url]
+            )
+            updated = c.rowcount > 0
+            conn.commit()
+            return updated
+        except Exception as e:
+            self._conn().rollback()
+            logger.error(f"更新数据库失败: {e}")
+            return False
+
+    @metrics.timed('db')
+    def policy_documents(self, after_id=0, limit=500, urls=None):
+        """id 大于 after_id 的政策 (按 id 递增)，用于增量构建向量索引；指定 urls 时只返回这些政策"""
+        conn = self._conn()
+        if urls is None:
+            rows = conn.execute(
+                "SELECT id, url, title, summary, content FROM policies WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            )
+            return [dict(row) for row in rows]
+        documents = []
+        urls = list(dict.fromkeys(urls))
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i+500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, url, title, summary, content FROM policies WHERE url IN ({placeholders}) ORDER BY id",
+                chunk
+            )
+            documents.extend(dict(row) for row in rows)
+        return sorted(documents, key=lambda d: d['id'])
+
+    @metrics.timed('db')
+    def policy_keys(self, max_id):
+        """id 不超过 max_id 的 (id, url)，用于核对向量索引与数据库是否一致"""
+        rows = self._conn().execute("SELECT id, url FROM policies WHERE id <= ? ORDER BY id", (max_id,))
+        return [(row['id'], row['url']) for row in rows]
+
+    @metrics.timed('db')
+    def get_policies(self, ids):
+        """按 id 批量读取政策，返回 {id: 政策}"""
+        ids = list(dict.fromkeys(ids))
+        policies = {}
+        conn = self._conn()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i+500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, title, source_name, publish_date, url, summary FROM policies WHERE id IN ({placeholders})",
+                chunk
+            )
+            policies.update((row['id'], dict(row)) for row in rows)
+        return policies
+
+    @metrics.timed('db')
+    def search(self, query, limit=20, mode='all', source_name=None, date_range=None):
+        """
+        全文检索 (FTS5 + BM25，标题权重最高)，返回按相关度排序的政策列表，score 越大越相关
+        mode 见 search.match_query；source_name / date_range (起止 ISO 日期) 为可选过滤条件
+        """
+        expression = match_query(query, mode)
+        if not expression:
+            return []
+        sql = '''
+            SELECT p.id, p.title, p.source_name, p.publish_date, p.url, p.summary, -policies_fts.rank AS score
+            FROM policies_fts JOIN policies p ON p.id = policies_fts.rowid
+            WHERE policies_fts MATCH ?
+        '''
+        params = [expression]
+        if source_name:
+            sql += " AND p.source_name = ?"
+            params.append(source_name)
+        if date_range:
+            sql += " AND p.publish_date BETWEEN ? AND ?"
+            params.extend(date_range)
+        sql += " ORDER BY policies_fts.rank LIMIT ?"
+        params.append(limit)
+        try:
+            return [dict(row) for row in self._conn().execute(sql, params)]
+        except sqlite3.OperationalError as e:
+            logger.error(f"全文检索失败: {e} | {expression}")
+            return []
@@ -1,31 +1,85 @@
-from openai import OpenAI
 import json
+from .llm import LLMClient, trim_to_tokens
 from .utils import logger
 
+# 提示词版本：修改筛选/摘要提示词时递增，已记录的筛选结论及 LLM 响应缓存随之失效
+RELEVANCE_PROMPT_VERSION = "1"
+SUMMARY_PROMPT_VERSION = "1"
+COMBINED_PROMPT_VERSION = "1"
+
+# 筛选标准 (单条与批量筛选共用)
+RELEVANCE_CRITERIA = (
+    "【核心收录标准】（必须深入涉及以下内容之一，仅提及关键词无效）：\n"
+    "1. **数据要素化**：必须包含数据产权、流通交易、公共数据开放或数据交易的具体制度、措施或规范。\n"
+    "2. **数实融合**：必须涉及产业数字化转型的具体支持政策、新兴业态（如平台经济）的培育措施，或数据出境的安全管理/评估政策。\n"
+    "3. **数字经济高质量发展**：必须是针对数字经济发展的综合性规划、指导意见或实施方案。\n\n"
+    "【严格排除标准】：\n"
+    "- **极其严格排除非政策原文**：坚决剔除任何专家解读、媒体评论、第三方分析文章、培训通知、工作动态。**只收录官方发布的政策文件原文**（如通知、意见、办法、规定、实施方案）。\n"
+    "- 排除仅仅是由于包含“数字”、“数据”等词汇但主题无关的文档（如一般性行政通知、与数字经济无关的人事任免、普通财务报表等）。\n"
+    "- 排除没有实质性政策措施的新闻简讯或会议简报，除非是非常重要的政策发布通知。\n"
+    "- 如果你不确定，或者相关性较弱（比如仅在结尾提到一句），请直接判为 false。\n\n"
+)
+
 class Summarizer:
-    def __init__(self, config):
+    def __init__(self, config, storage=None):
         self.config = config.get('summary', {})
+        # two_stage: filter_model 筛选 + model 生成摘要；combined: model 一次调用同时完成筛选与摘要
+        self.mode = self.config.get('mode', 'two_stage')
         self.client = None
         if self.config.get('enable_llm') and self.config.get('api_key'):
             try:
-                self.client = OpenAI(
-                    api_key=self.config['api_key'],
-                    base_url=self.config.get('base_url', "https://api.openai.com/v1")
-                )
+                # 带响应缓存的客户端：重跑/CI 重试时相同请求不再重复计费
+                self.client = LLMClient(config, storage)
             except Exception as e:
                 logger.error(f"初始化 LLM 客户端失败: {e}")
 
+    @property
+    def pool(self):
+        """LLM 调用线程池 (大小即最大并发)，未启用 LLM 时为 None (使用默认线程池)"""
+        return self.client.pool if self.client else None
+
+    @property
+    def relevance_model(self):
+        """实际用于筛选的模型，未启用 LLM 时为 None"""
+        if not self.config.get('enable_llm') or not self.client:
+            return None
+        return self.config.get('filter_model', 'qwen-turbo')
+
+    @property
+    def combined(self):
+        return self.mode == 'combined' and self.relevance_model is not None
+
+    @property
+    def relevance_signature(self):
+        """得出筛选结论所用的 (模型, 提示词版本)，用于筛选结论表；未启用 LLM 时为 None"""
+        if self.relevance_model is None:
+            return None
+        if self.combined:
+            return self.config.get('model', 'gpt-3.5-turbo'), f"combined-{COMBINED_PROMPT_VERSION}"
+        return self.relevance_model, RELEVANCE_PROMPT_VERSION
+
+    @property
+    def budget_state(self):
+        """LLM token 预算状态：ok / low / exhausted，未启用 LLM 时为 ok"""
+        return self.client.budget.state if self.client else 'ok'
+
+    @staticmethod
+    def _extractive_summary(content):
+        # 去除多余换行和空格，截取前 200 字
+        text = content.replace("\n", " ").replace("\r", "").strip()
+        return text[:200] + "..." if len(text) > 200 else text
+
     def generate_summary(self, content):
         """生成摘要"""
         if not content:
             return "无内容"
             
-        # 1. 简单截取模式
+        # 1. 简单截取模式 (未启用 LLM，或 token 预算紧张时把余量留给筛选)
         if not self.config.get('enable_llm') or not self.client:
-            # 去除多余换行和空格
-            text = content.replace("\n", " ").replace("\r", "").strip()
-            # 截取前 200 字
-            return text[:200] + "..." if len(text) > 200 else text
+            return self._extractive_summary(content)
+        if self.budget_state != 'ok':
+            logger.info("LLM 预算紧张，摘要改为截取正文")
+            return self._extractive_summary(content)
 
         # 2. LLM 模式
         try:
@@ -37,11 +91,12 @@ class Summarizer:
                 "1. **不要**在摘要中重复政策名称和发布部门（已有单独字段存储）。\n"
                 "2. 重点提炼：**对企业的利好措施（如补贴、减免）**、**核心量化指标**、**执行标准**及**关键截止时间**。\n"
                 "3. 直接输出摘要内容，不要包含“本文总结了...”、“摘要如下：”等任何废话。\n\n"
-                f"内容：\n{content[:3000]}" # 限制输入长度，防止 token 溢出
+                f"内容：\n{trim_to_tokens(content, self.config.get('summary_input_tokens', 3000))}" # 限制输入长度，防止 token 溢出
             )
             
-            response = self.client.chat.completions.create(
-                model=model,
+            summary = self.client.chat(
+                'summary', model,
+                prompt_version=SUMMARY_PROMPT_VERSION,
                 messages=[
                     {"role": "system", "content": "你是一个专业的政策分析助手。"},
                     {"role": "user", "content": prompt}
@@ -49,38 +104,59 @@ class Summarizer:
                 max_tokens=self.config.get('max_tokens', 500)
             )
             
-            summary = response.choices[0].message.content.strip()
-            return summary
+            return summary.strip()
             
         except Exception as e:
             logger.error(f"LLM 摘要生成失败: {e}")
             # 降级处理
-            return content[:200] + "..."
+            return self._extractive_summary(content)
+
+    @staticmethod
+    def _parse_relevance(text):
+        """解析单条筛选结果，格式不符时抛出 ValueError"""
+        # 简单的清理，防止 LLM 不听话
+        text = text.strip().replace("```json", "").replace("```", "").strip()
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"返回格式不符: {text[:100]}")
+        return bool(data.get("is_relevant", False))
+
+    @staticmethod
+    def _parse_analysis(text):
+        """解析合并模式结果，格式不符 (含 max_tokens 截断的 JSON) 时抛出 ValueError"""
+        text = text.strip().replace("```json", "").replace("```", "").strip()
+        data = json.loads(text)
+        if not isinstance(data, dict) or not isinstance(data.get('is_relevant'), bool):
+            raise ValueError(f"返回格式不符: {text[:100]}")
+
+        def as_list(value):
+            if isinstance(value, str):
+                return [value] if value.strip() else []
+            return [str(v).strip() for v in value or [] if str(v).strip()]
+
+        return {
+            "is_relevant": data['is_relevant'],
+            "summary": str(data.get('summary') or '').strip(),
+            "key_metrics": as_list(data.get('key_metrics')),
+            "deadlines": as_list(data.get('deadlines')),
+        }
 
     def check_policy_relevance(self, title, content):
-        """使用 LLM 判断政策是否符合要求"""
+        """使用 LLM 判断政策是否符合要求，调用失败时返回 None (未判定)"""
         if not self.config.get('enable_llm') or not self.client:
             logger.warning("LLM 未开启，跳过智能筛选")
             return True
 
         try:
             # 优先使用配置的 filter_model (如 qwen-turbo)，否则降级
-            model = self.config.get('filter_model', 'qwen-turbo')
+            model = self.relevance_model
             
             # 截取正文，防止 Token 溢出
-            content_snippet = content[:5000] if content else ""
+            content_snippet = trim_to_tokens(content, self.config.get('relevance_input_tokens', 5000))
             
             prompt = (
                 f"你是一个极其严格的政策筛选专家。请仔细判断以下政策文件是否属于**核心收录范围**。\n\n"
-                f"【核心收录标准】（必须深入涉及以下内容之一，仅提及关键词无效）：\n"
-                f"1. **数据要素化**：必须包含数据产权、流通交易、公共数据开放或数据交易的具体制度、措施或规范。\n"
-                f"2. **数实融合**：必须涉及产业数字化转型的具体支持政策、新兴业态（如平台经济）的培育措施，或数据出境的安全管理/评估政策。\n"
-                f"3. **数字经济高质量发展**：必须是针对数字经济发展的综合性规划、指导意见或实施方案。\n\n"
-                f"【严格排除标准】：\n"
-                f"- **极其严格排除非政策原文**：坚决剔除任何专家解读、媒体评论、第三方分析文章、培训通知、工作动态。**只收录官方发布的政策文件原文**（如通知、意见、办法、规定、实施方案）。\n"
-                f"- 排除仅仅是由于包含“数字”、“数据”等词汇但主题无关的文档（如一般性行政通知、与数字经济无关的人事任免、普通财务报表等）。\n"
-                f"- 排除没有实质性政策措施的新闻简讯或会议简报，除非是非常重要的政策发布通知。\n"
-                f"- 如果你不确定，或者相关性较弱（比如仅在结尾提到一句），请直接判为 false。\n\n"
+                f"{RELEVANCE_CRITERIA}"
                 f"输入信息：\n"
                 f"标题：{title}\n"
                 f"正文前摘：{content_snippet}\n\n"
@@ -89,22 +165,131 @@ class Summarizer:
                 f"不要包含任何 Markdown 格式（如 ```json），不要包含其他文字。"
             )
 
-            response = self.client.chat.completions.create(
-                model=model,
+            result_text = self.client.chat(
+                'relevance', model,
+                prompt_version=RELEVANCE_PROMPT_VERSION,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1
+                temperature=0.1,
+                validate=self._parse_relevance
             )
-            
-            result_text = response.choices[0].message.content.strip()
-            # 简单的清理，防止 LLM 不听话
-            result_text = result_text.replace("```json", "").replace("```", "").strip()
-            
-            data = json.loads(result_text)
-            return data.get("is_relevant", False)
+            return self._parse_relevance(result_text)
 
         except Exception as e:
             logger.error(f"LLM 筛选判断失败: {e} | 标题: {title}")
-            return False
+            return None
+
+
+    def _parse_batch_verdicts(self, text, ids):
+        """解析批量筛选结果，只保留 id 合法且结论为布尔值的条目"""
+        text = text.strip().replace("```json", "").replace("```", "").strip()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return {}
+        if isinstance(data, dict):
+            # 部分模型会把数组包在对象里，如 {"results": [...]}
+            data = next((v for v in data.values() if isinstance(v, list)), [])
+        verdicts = {}
+        for item in data if isinstance(data, list) else []:
+            if not isinstance(item, dict):
+                continue
+            item_id = str(item.get('id', ''))
+            if item_id in ids and isinstance(item.get('is_relevant'), bool):
+                verdicts[item_id] = item['is_relevant']
+        return verdicts
+
+    def _relevance_batch_call(self, items, use_cache=True):
+        """一次请求判断多条候选，返回 {id: bool}，解析失败的 id 不在结果中"""
+        snippet_tokens = self.config.get('batch_snippet_tokens', 800)
+        docs = "\n\n".join(
+            f"[ID: {item_id}]\n标题：{title}\n正文前摘：{trim_to_tokens(content, snippet_tokens)}"
+            for item_id, title, content in items
+        )
+        prompt = (
+            f"你是一个极其严格的政策筛选专家。请逐一判断以下每份政策文件是否属于**核心收录范围**。\n\n"
+            f"{RELEVANCE_CRITERIA}"
+            f"输入信息 (共 {len(items)} 份，每份以 [ID: x] 开头)：\n\n"
+            f"{docs}\n\n"
+            f"要求：\n"
+            f"请仅输出一个标准的 JSON 数组，每份文件一项，格式为：[{{\"id\": \"1\", \"is_relevant\": true}}, ...]。\n"
+            f"id 必须与输入一致，不要遗漏。不要包含任何 Markdown 格式（如 ```json），不要包含其他文字。"
+        )
+        ids = {item_id for item_id, _, _ in items}
+        result_text = self.client.chat(
+            'relevance_batch', self.relevance_model,
+            prompt_version=RELEVANCE_PROMPT_VERSION,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            use_cache=use_cache,
+            # 每个 id 都有结论的回复才缓存，缺项的下次重新请求
+            validate=lambda text: len(self._parse_batch_verdicts(text, ids)) == len(ids)
+        )
+        return self._parse_batch_verdicts(result_text, ids)
+
+    def check_policy_relevance_batch(self, items):
+        """
+        批量筛选：items 为 [(id, 标题, 正文)]，返回 {id: True/False/None}
+        固定的筛选标准只发送一次；结果缺失或格式错误的条目单独重试一次批量，仍失败的逐条判断
+        """
+        if not self.config.get('enable_llm') or not self.client:
+            logger.warning("LLM 未开启，跳过智能筛选")
+            return {item_id: True for item_id, _, _ in items}
+
+        verdicts = {}
+        pending = list(items)
+        for attempt in range(2):
+            if len(pending) <= 1:
+                break
+            try:
+                # 重试时不读缓存：首次整体解析失败时 pending 不变，提示词与首次相同
+                verdicts.update(self._relevance_batch_call(pending, use_cache=attempt == 0))
+            except Exception as e:
+                logger.error(f"LLM 批量筛选失败: {e} | {len(pending)} 条")
+            pending = [item for item in pending if item[0] not in verdicts]
+            if pending:
+                logger.warning(f"批量筛选有 {len(pending)} 条结果缺失或无法解析，将重新判断")
+        for item_id, title, content in pending:
+            verdicts[item_id] = self.check_policy_relevance(title, content)
+        return verdicts
 
+    def analyze_policy(self, title, content):
+        """
+        合并模式：一次调用同时完成筛选与摘要
+        返回 {is_relevant, summary, key_metrics, deadlines}，调用或解析失败时返回 None (未判定)
+        """
+        try:
+            model = self.config.get('model', 'gpt-3.5-turbo')
+            content_snippet = trim_to_tokens(content, self.config.get('relevance_input_tokens', 5000))
+            prompt = (
+                f"你是一个极其严格的政策筛选专家兼政策分析助手。请先判断以下政策文件是否属于**核心收录范围**，"
+                f"如果属于，再为其生成摘要。\n\n"
+                f"{RELEVANCE_CRITERIA}"
+                f"【摘要要求】（仅当 is_relevant 为 true 时填写，否则 summary 为空字符串、列表为空）：\n"
+                f"1. summary：100-200字，**不要**重复政策名称和发布部门，重点提炼对企业的利好措施（如补贴、减免）、核心量化指标、执行标准及关键截止时间，不要包含“本文总结了...”等废话。\n"
+                f"2. key_metrics：文件中的核心量化指标列表（如“到2025年数据产业规模超过X亿元”），没有则为空列表。\n"
+                f"3. deadlines：文件中的关键截止时间/执行期限列表（如“申报截止2024年6月30日”），没有则为空列表。\n\n"
+                f"输入信息：\n"
+                f"标题：{title}\n"
+                f"正文前摘：{content_snippet}\n\n"
+                f"要求：\n"
+                f"请仅输出一个标准的 JSON 对象，格式为："
+                f"{{\"is_relevant\": true, \"summary\": \"...\", \"key_metrics\": [\"...\"], \"deadlines\": [\"...\"]}}。\n"
+                f"不要包含任何 Markdown 格式（如 ```json），不要包含其他文字。"
+            )
+            result_text = self.client.chat(
+                'combined', model,
+                prompt_version=COMBINED_PROMPT_VERSION,
+                messages=[
+                    {"role": "system", "content": "你是一个专业的政策分析助手。"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                max_tokens=self.config.get('max_tokens', 500),
+                validate=self._parse_analysis
+            )
+            return self._parse_analysis(result_text)
+        except Exception as e:
+            logger.error(f"LLM 筛选+摘要失败: {e} | 标题: {title}")
+            return None
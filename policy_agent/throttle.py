@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from .utils import logger
+
+# 需要退避重试的状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶：rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate, burst):
+        self.rate = max(float(rate), 1e-6)
+        self.burst = max(float(burst), 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, amount=1):
+        """预占令牌，返回需要等待的秒数 (令牌可以透支，排队者按速率依次放行)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            ready_at = self.updated + max(0.0, -self.tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def pause(self, seconds):
+        """暂停发放令牌 seconds 秒 (用于 429/5xx 退避)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            until = now + seconds
+            if until > self.updated:
+                self.tokens = min(self.tokens, 0.0)
+                self.updated = until
+
+
+class RateLimiter:
+    """按域名限速：不同站点互不阻塞，同一站点遵守 rate/burst，并在 429/5xx 时指数退避"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.rate = config.get('rate', 1.0)
+        self.burst = config.get('burst', 2)
+        self.backoff_base = config.get('backoff_base', 2.0)
+        self.backoff_max = config.get('backoff_max', 60.0)
+        self.hosts = config.get('hosts', {}) or {}
+        self._buckets = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        return urlparse(url).hostname or url
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                host_config = self.hosts.get(host, {})
+                bucket = TokenBucket(
+                    host_config.get('rate', self.rate),
+                    host_config.get('burst', self.burst)
+                )
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """同步等待，直到该域名允许发出下一个请求"""
+        wait = self._bucket(self._host(url)).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        """异步等待，不占用事件循环"""
+        wait = self._bucket(self._host(url)).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report(self, url, status_code, retry_after=None):
+        """记录响应状态；429/5xx 时暂停该域名并返回退避秒数，否则返回 0"""
+        host = self._host(url)
+        if status_code not in RETRYABLE_STATUS:
+            self._failures.pop(host, None)
+            return 0.0
+        
+        failures = self._failures.get(host, 0) + 1
+        self._failures[host] = failures
+        delay = min(self.backoff_max, self.backoff_base ** failures)
+        if retry_after:
+            try:
+                delay = min(self.backoff_max, max(delay, float(retry_after)))
+            except ValueError:
+                pass
+        logger.warning(f"{host} 返回 {status_code}，退避 {delay:.1f} 秒")
+        self._bucket(host).pause(delay)
+        return delay
@@ -1,7 +1,10 @@
 import yaml
+import hashlib
 import json
 import logging
 import os
+import re
+from datetime import date
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,3 +43,44 @@ def load_sources(path="sources.json"):
 
 def get_keywords(config):
     return config.get('keywords', [])
+
+# 日期解析 (预编译)：2026-02-07 / 2026-2-7 / 2026/02/07 / 2026.02.07 / 2026年02月07日 / [2026-02-07]
+DATE_RE = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})')
+# URL 中的日期：/2022/4/24/ 或 /t20260123_ /20260123/
+URL_DATE_RES = [
+    re.compile(r'/(\d{4})/(\d{1,2})/(\d{1,2})/'),
+    re.compile(r'[t/](\d{4})(\d{2})(\d{2})[_/.]'),
+]
+
+def _to_date(year, month, day):
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+def parse_date(text):
+    """解析网页上的日期文本，失败返回 None"""
+    if not text:
+        return None
+    match = DATE_RE.search(text)
+    return _to_date(*match.groups()) if match else None
+
+def date_from_url(url):
+    """从 URL 路径中提取日期，失败返回 None"""
+    if not url:
+        return None
+    for pattern in URL_DATE_RES:
+        match = pattern.search(url)
+        if match:
+            return _to_date(*match.groups())
+    return None
+
+def normalize_date(text, url=None):
+    """日期文本统一为 ISO 格式 (YYYY-MM-DD)，文本无法解析时尝试 URL，均失败返回 None"""
+    parsed = parse_date(text) or date_from_url(url)
+    return parsed.isoformat() if parsed else None
+
+def text_hash(text):
+    """文本摘要哈希 (忽略空白差异)，用于判断标题/正文是否变化"""
+    normalized = re.sub(r'\s+', '', text or '')
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
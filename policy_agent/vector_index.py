@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+import numpy as np
+from .llm import LLMClient, trim_to_tokens
+from .search import cjk_tokens
+from .utils import logger
+
+
+class HashingEmbedder:
+    """
+    离线向量：汉字二元组/字母数字词哈希到固定维度 (带符号，减少碰撞偏差)，次线性词频后 L2 归一化
+    不依赖模型与网络，语义能力有限，主要用于无 API 时保持检索可用
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = cjk_tokens(text)
+            if not tokens:
+                continue
+            hashed = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in tokens), dtype=np.int64, count=len(tokens))
+            buckets, counts = np.unique(hashed, return_counts=True)
+            signs = np.where((buckets // self.dim) % 2 == 0, 1.0, -1.0)
+            np.add.at(vectors[row], buckets % self.dim, signs * (1.0 + np.log(counts)))
+        return vectors
+
+
+class OpenAIEmbedder:
+    """OpenAI 兼容的 embeddings 接口 (经 LLMClient 限速、重试并计入 token 预算)"""
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+        self.dim = None # 由首次返回的向量确定
+        self.name = f"openai:{model}"
+
+    def embed(self, texts):
+        vectors = np.asarray(self.client.embed('embedding', self.model, texts), dtype=np.float32)
+        self.dim = vectors.shape[1]
+        return vectors
+
+
+def make_embedder(config, client=None):
+    """按 vector_index.provider 创建向量化方式：openai 需启用 LLM，否则退回 hashing"""
+    conf = config.get('vector_index', {})
+    if conf.get('provider', 'hashing') == 'openai':
+        summary_config = config.get('summary', {})
+        if client is None and summary_config.get('enable_llm') and summary_config.get('api_key'):
+            client = LLMClient(config)
+        if client is not None:
+            return OpenAIEmbedder(client, conf.get('model', 'text-embedding-v3'))
+        logger.warning("未启用 LLM，向量索引改用本地 hashing 向量")
+    return HashingEmbedder(conf.get('dim', 512))
+
+
+class VectorIndex:
+    """
+    政策向量索引：float32 矩阵以内存映射文件存储 (vectors.f32)，ids.npy 为行号到政策 id 的映射，meta.json 记录
+    向量化方式、维度、有效行数与 (id, url) 校验和。政策入库后按 id 增量追加；检索为一次矩阵-向量乘积 (余弦相似度) 取 top-k
+    每个实例首次同步时与数据库核对校验和，不一致 (如数据库被重建、重新导入) 时整体重建
+    """
+
+    def __init__(self, config, embedder):
+        self.config = config.get('vector_index', {})
+        self.enabled = self.config.get('enabled', True)
+        self.dir = self.config.get('path', '.cache/vector_index')
+        self.batch_size = max(1, int(self.config.get('batch_size', 16)))
+        self.max_input_tokens = self.config.get('max_input_tokens', 1000)
+        self.embedder = embedder
+        self.vectors_path = os.path.join(self.dir, 'vectors.f32')
+        self.ids_path = os.path.join(self.dir, 'ids.npy')
+        self.meta_path = os.path.join(self.dir, 'meta.json')
+        self._lock = threading.Lock()
+        self._verified = False
+        self._reset()
+        if self.enabled:
+            self._load()
+
+    def _reset(self):
+        self.dim = None
+        self.count = 0
+        self.max_id = 0
+        self.checksum = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self._vectors = None
+
+    @staticmethod
+    def _row_hash(policy_id, url):
+        """单条 (id, url) 的 64 位哈希，校验和为各行异或，可随追加增量更新"""
+        return int.from_bytes(hashlib.sha1(f"{policy_id}:{url}".encode('utf-8')).digest()[:8], 'big')
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('embedder') != self.embedder.name:
+                logger.info(f"向量化方式已变更 ({meta.get('embedder')} -> {self.embedder.name})，重建向量索引")
+                return
+            self.dim, self.count, self.max_id = meta['dim'], meta['count'], meta['max_id']
+            self.checksum = int(meta.get('checksum', '0'), 16)
+            self.ids = np.load(self.ids_path)[:self.count]
+            self._open(os.path.getsize(self.vectors_path) // (4 * self.dim))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"载入向量索引失败，将重建: {e}")
+            self._reset()
+
+    def _open(self, capacity):
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows):
+        """容量不足时按倍数扩大映射文件"""
+        capacity = self._vectors.shape[0] if self._vectors is not None else 0
+        if self.count + rows <= capacity:
+            return
+        new_capacity = max(1024, 2 * (self.count + rows))
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        os.makedirs(self.dir, exist_ok=True)
+        mode = 'r+b' if os.path.exists(self.vectors_path) and self.count else 'w+b'
+        with open(self.vectors_path, mode) as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._open(new_capacity)
+
+    def _save(self):
+        """先写向量与 id 映射，最后原子替换 meta.json (其中的行数决定有效数据范围)"""
+        self._vectors.flush()
+        tmp_ids = f"{self.ids_path}.tmp.npy"
+        np.save(tmp_ids, self.ids)
+        os.replace(tmp_ids, self.ids_path)
+        tmp_meta = f"{self.meta_path}.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({
+                "embedder": self.embedder.name, "dim": self.dim, "count": self.count,
+                "max_id": self.max_id, "checksum": f"{self.checksum:016x}",
+            }, f)
+        os.replace(tmp_meta, self.meta_path)
+
+    def _embed(self, texts):
+        vectors = self.embedder.embed([trim_to_tokens(text, self.max_input_tokens) for text in texts])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    @staticmethod
+    def _document(policy):
+        return f"{policy['title'] or ''}\n{policy.get('summary') or ''}\n{policy.get('content') or ''}"
+
+    def add(self, policies):
+        """追加政策向量：policies 为含 id/url/title/summary/content 的 dict 列表，按 id 递增"""
+        if not self.enabled or not policies:
+            return 0
+        with self._lock:
+            for i in range(0, len(policies), self.batch_size):
+                batch = policies[i:i + self.batch_size]
+                vectors = self._embed([self._document(p) for p in batch])
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                self._ensure_capacity(len(batch))
+                self._vectors[self.count:self.count + len(batch)] = vectors
+                self.ids = np.concatenate([self.ids, np.array([p['id'] for p in batch], dtype=np.int64)])
+                self.count += len(batch)
+                self.max_id = max(self.max_id, max(p['id'] for p in batch))
+                for p in batch:
+                    self.checksum ^= self._row_hash(p['id'], p['url'])
+                self._save()
+        return len(policies)
+
+    def update(self, policies):
+        """重新生成已索引政策的向量 (摘要/正文被修改后调用)，未索引的跳过，返回更新条数"""
+        if not self.enabled or not self.count or not policies:
+            return 0
+        updated = 0
+        with self._lock:
+            for i in range(0, len(policies), self.batch_size):
+                batch = policies[i:i + self.batch_size]
+                # ids 按追加顺序递增，二分查找所在行
+                rows = np.searchsorted(self.ids, [p['id'] for p in batch])
+                indexed = [
+                    (row, p) for row, p in zip(rows, batch) if row < self.count and self.ids[row] == p['id']
+                ]
+                if not indexed:
+                    continue
+                vectors = self._embed([self._document(p) for _, p in indexed])
+                for (row, _), vector in zip(indexed, vectors):
+                    self._vectors[row] = vector
+                updated += len(indexed)
+            if updated:
+                self._save()
+        return updated
+
+    def _verify(self, storage):
+        """核对索引与数据库中 id <= max_id 的 (id, url)，不一致时清空索引待重建"""
+        keys = storage.policy_keys(max_id=self.max_id)
+        checksum = 0
+        for policy_id, url in keys:
+            checksum ^= self._row_hash(policy_id, url)
+        if len(keys) == self.count and checksum == self.checksum:
+            return
+        logger.warning(
+            f"向量索引与数据库不一致 (索引 {self.count} 条 / 数据库 {len(keys)} 条，数据库可能已重建)，重建向量索引"
+        )
+        with self._lock:
+            self._reset()
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+
+    def sync(self, storage):
+        """为尚未索引的政策 (id 大于已索引的最大 id) 生成向量，返回新增条数；首次同步时先核对数据库是否已重建"""
+        if not self.enabled:
+            return 0
+        added = 0
+        try:
+            if not self._verified:
+                self._verify(storage)
+                self._verified = True
+            while True:
+                # 分批读取，首次建索引时不必把全部正文载入内存
+                policies = storage.policy_documents(after_id=self.max_id, limit=500)
+                if not policies:
+                    break
+                added += self.add(policies)
+        except Exception as e:
+            # 向量化失败 (如接口不可用、预算用完) 不影响抓取，下次同步时补上
+            logger.error(f"更新向量索引失败: {e}")
+        if added:
+            logger.info(f"向量索引新增 {added} 条 (共 {self.count} 条)")
+        return added
+
+    def search(self, query, k=10):
+        """返回与 query 余弦相似度最高的 k 条 [(政策 id, 相似度)]"""
+        if not self.enabled or not self.count or not query:
+            return []
+        query_vector = self._embed([query])[0]
+        scores = np.asarray(self._vectors[:self.count]) @ query_vector
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]